@@ -0,0 +1,170 @@
+'''
+Cheap checks that find trusses which can't carry a load before anything is factorized.
+
+In order of cost:
+    counting rule       members + reactions must be at least 2 * joints
+    connectivity        every node must be connected to the rest of the truss by members
+    structural rank     a maximum matching between the equilibrium equations (two per node) and the
+                        unknowns (member forces and reactions). An equation left unmatched is a direction
+                        a node can move in without stretching any member, an unknown left unmatched is redundant.
+
+The structural rank only looks at which entries of the equilibrium matrix are nonzero, so a truss that passes
+can still be a mechanism because of its geometry (for example three collinear nodes); Bridge.solve
+catches those when the factorization turns out singular.
+'''
+from collections import deque
+
+import numpy as np
+from scipy.sparse.csgraph import connected_components
+import scipy.sparse as sp
+
+
+def counting_rule(bridge):
+    '''
+    Returns members + reactions - 2 * joints: negative for a mechanism, positive for a
+    statically indeterminate truss, 0 for a determinate one.
+    '''
+    return bridge.num_members + bridge.num_displacements - 2 * bridge.num_nodes
+
+
+def connected_parts(bridge):
+    '''
+    Label of the connected part of the truss every node belongs to, and the number of parts.
+    Computed with scipy's connected components, the compiled equivalent of a union-find over the members.
+    '''
+    num_nodes = bridge.num_nodes
+    member_nodes = bridge.get_member_nodes()
+    graph = sp.coo_matrix((np.ones(len(member_nodes)), (member_nodes[:, 0], member_nodes[:, 1])), shape=(num_nodes, num_nodes))
+    count, labels = connected_components(graph, directed=False)
+    return labels, count
+
+
+def maximum_matching(matrix):
+    '''
+    Maximum matching between the rows and the columns of a sparse matrix, ignoring stored zeros.
+    Greedy matching first, then one augmenting path search per column the greedy pass left unmatched
+    (rows seen by a failed search stay marked until the next successful one, which keeps this linear
+    for trusses with few redundant unknowns).
+
+    Returns (row_match, column_match): the column matched to every row and the row matched to every column, -1 if none.
+    '''
+    matrix = sp.csc_matrix(matrix)
+    matrix.eliminate_zeros()
+    num_rows, num_columns = matrix.shape
+    indptr = matrix.indptr.tolist()
+    indices = matrix.indices.tolist()
+
+    row_match = [-1] * num_rows
+    column_match = [-1] * num_columns
+    for column in range(num_columns):
+        for row in indices[indptr[column]:indptr[column + 1]]:
+            if row_match[row] < 0:
+                row_match[row] = column
+                column_match[column] = row
+                break
+
+    visited = [False] * num_rows
+    for start in range(num_columns):
+        if column_match[start] >= 0:
+            continue
+
+        # Breadth-first search for an alternating path to a free row
+        parent = {}  # row -> column it was reached from
+        queue = deque([start])
+        free_row = -1
+        while queue and free_row < 0:
+            column = queue.popleft()
+            for row in indices[indptr[column]:indptr[column + 1]]:
+                if visited[row]:
+                    continue
+                visited[row] = True
+                parent[row] = column
+                if row_match[row] < 0:
+                    free_row = row
+                    break
+                queue.append(row_match[row])
+
+        if free_row < 0:
+            continue
+
+        # Flip the path
+        row = free_row
+        while row >= 0:
+            column = parent[row]
+            previous = column_match[column]
+            row_match[row] = column
+            column_match[column] = row
+            row = previous
+        for row in parent:
+            visited[row] = False
+
+    return np.array(row_match, dtype=np.intp), np.array(column_match, dtype=np.intp)
+
+
+def _describe_rows(bridge, rows, limit=5):
+    nodes = bridge.get_nodes()
+    text = ', '.join(f"node {nodes[row // 2].get_id()} in {'xy'[row % 2]}" for row in rows[:limit])
+    if len(rows) > limit:
+        text += f" and {len(rows) - limit} more"
+    return text
+
+
+def _describe_columns(columns, indices, limit=5):
+    names = []
+    for index in indices[:limit]:
+        label = columns[index]
+        if label[0] == 'F':
+            names.append('member ' + label[1:])
+        else:
+            names.append(f"the {label[-1]} reaction at node {label[1:-1]}")
+    text = ', '.join(names)
+    if len(indices) > limit:
+        text += f" and {len(indices) - limit} more"
+    return text
+
+
+def check_counting_rule(bridge):
+    '''
+    Returns an error message if the truss has too few members and reactions, otherwise ''.
+    '''
+    surplus = counting_rule(bridge)
+    if surplus < 0:
+        return (f"The truss is unstable: it has {bridge.num_members} members and {bridge.num_displacements} support reactions, "
+                f"but {2 * bridge.num_nodes} are needed for {bridge.num_nodes} nodes. Add at least {-surplus} more.")
+    return ''
+
+
+def check_connectivity(bridge):
+    '''
+    Returns an error message naming the nodes that aren't connected to the left support's part of the truss, otherwise ''.
+    '''
+    labels, count = connected_parts(bridge)
+    if count <= 1:
+        return ''
+    main = labels[bridge.left_node.index] if bridge.left_node is not None else np.bincount(labels).argmax()
+    loose = np.flatnonzero(labels != main)
+    nodes = bridge.get_nodes()
+    names = ', '.join(nodes[i].get_id() for i in loose[:5]) + (f" and {len(loose) - 5} more" if len(loose) > 5 else '')
+    return f"The truss is in {count} separate pieces: node(s) {names} are not connected to the left support."
+
+
+def check_structure(bridge, matrix, columns):
+    '''
+    Structural rank check of the equilibrium matrix.
+    Returns (error message or '', indices of the redundant columns of one possible choice).
+    '''
+    # Reactions are matched first, so the redundant unknowns reported are members where possible
+    num_members = sum(1 for label in columns if label[0] == 'F')
+    order = np.r_[num_members:len(columns), 0:num_members]
+    row_match, column_match = maximum_matching(sp.csc_matrix(matrix)[:, order])
+    column_match = column_match[np.argsort(order)]
+    free_rows = np.flatnonzero(row_match < 0)
+    if len(free_rows):
+        return ('The truss is a mechanism, it can move without stretching any member: '
+                + _describe_rows(bridge, free_rows) + '.'), np.flatnonzero(column_match < 0)
+    return '', np.flatnonzero(column_match < 0)
+
+
+def describe_redundant(columns, redundant):
+    return ('The truss is statically indeterminate, these members or reactions are redundant: '
+            + _describe_columns(columns, redundant) + '.')
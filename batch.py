@@ -0,0 +1,108 @@
+'''
+Solves a directory (or glob) of bridge files in parallel and writes one summary table.
+
+    python batch.py bridges/ -o summary.csv
+    python batch.py "submissions/*.txt" --workers 8
+'''
+import argparse
+import csv
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bridge import Bridge
+
+
+SUMMARY_COLUMNS = ['name', 'max_load', 'efficiency', 'total_length', 'critical_members', 'error']
+
+
+def find_bridge_files(paths):
+    '''
+    Expands directories (every .txt and .brb file inside) and glob patterns into a sorted list of absolute paths.
+    '''
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, '*.txt')) + glob.glob(os.path.join(path, '*.brb'))
+        else:
+            matches = glob.glob(path)
+        files.update(os.path.abspath(match) for match in matches if os.path.isfile(match))
+    return sorted(files)
+
+
+def init_worker():
+    '''
+    Silences the solver's stdout in the worker processes.
+    '''
+    sys.stdout = open(os.devnull, 'w')
+
+
+def evaluate_file(path):
+    '''
+    Loads and solves one bridge file. Returns a summary row, with the error message of
+    load_from_file / solve in 'error' if either failed.
+    '''
+    row = dict.fromkeys(SUMMARY_COLUMNS, '')
+    row['name'] = os.path.splitext(os.path.basename(path))[0]
+
+    bridge = Bridge()
+    bridge.output = None  # Only the summary is written
+    text = bridge.load_from_file(path)
+    if text == '':
+        try:
+            text = bridge.solve()
+        except Exception as e:
+            text = f"Failed to solve bridge: {e}"
+    if text != '':
+        row['error'] = text
+        return row
+
+    row['max_load'] = bridge.load
+    row['efficiency'] = bridge.efficiency
+    row['total_length'] = bridge.get_total_length()
+    row['critical_members'] = ' '.join(bridge.result.get_critical_ids())
+    return row
+
+
+def evaluate_files(files, workers=None):
+    '''
+    Evaluates every file on a process pool, returning the summary rows in the same order as files.
+    '''
+    chunksize = max(1, len(files) // (4 * (workers or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        return list(pool.map(evaluate_file, files, chunksize=chunksize))
+
+
+def write_summary(rows, outfile):
+    writer = csv.DictWriter(outfile, fieldnames=SUMMARY_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve many bridge files in parallel and summarize the results.')
+    parser.add_argument('paths', nargs='+', help='bridge .txt/.brb files, directories or glob patterns')
+    parser.add_argument('-o', '--output', help='summary CSV file (default: stdout)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    files = find_bridge_files(args.paths)
+    if not files:
+        parser.error('no bridge files found')
+
+    rows = evaluate_files(files, args.workers)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as outfile:
+            write_summary(rows, outfile)
+    else:
+        write_summary(rows, sys.stdout)
+
+    failed = sum(1 for row in rows if row['error'])
+    print(f"Solved {len(rows) - failed} of {len(rows)} bridges.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+'''
+Benchmarks for loading, assembling, solving, writing and plotting bridges of growing size.
+
+Every phase is timed separately on Pratt, Howe, Warren and K trusses from trusses.py, and the results
+are written as JSON so runs can be compared:
+
+    python benchmark.py -o before.json
+    python benchmark.py --baseline before.json     # prints the ratio to the baseline, exits 1 on a regression
+
+The startup phase runs solve_bridge.py on a small truss in a new interpreter, against STARTUP_TARGET.
+Plotting times a redraw of the GUI's BridgePlot (bridge_plot.py) on an off-screen matplotlib figure, and is skipped
+when matplotlib isn't installed or the truss has more than --max-plot-members members.
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bridge import Bridge
+from solver import Factorization, assemble_equilibrium, load_vector
+from trusses import GENERATORS, generate
+
+
+SIZES = [10, 100, 1000, 10000, 100000]
+PHASES = ['load', 'load_binary', 'assemble', 'factorize', 'solve', 'output', 'plot']
+STARTUP_TARGET = 0.75  # seconds for `python solve_bridge.py` on a small bridge, interpreter start included
+
+
+def time_call(function, repeat):
+    '''
+    Runs function repeat times, returning (median seconds, min seconds, last return value).
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), min(times), value
+
+
+def _plotter():
+    # The GUI draws through bridge_plot.BridgePlot, which doesn't need Qt, so it is timed on an off-screen figure.
+    # Every call is a redraw of the same figure, like the GUI after an edit.
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        from matplotlib.figure import Figure
+        from bridge_plot import BridgePlot
+    except ImportError:
+        return None
+
+    figure = Figure()
+    plot = BridgePlot(figure.add_subplot(111))
+
+    def redraw(bridge):
+        plot.update(bridge)
+        figure.canvas.draw()
+    return redraw
+
+
+def benchmark_truss(kind, members, repeat, scratch, plot=None, max_plot_members=20000):
+    '''
+    Times every phase on one generated truss. Returns a list of result dicts.
+    '''
+    bridge = generate(kind, members)
+    bridge.output = None
+    text_file = os.path.join(scratch, f"{kind}_{members}.txt")
+    binary_file = os.path.join(scratch, f"{kind}_{members}.brb")
+    output_file = os.path.join(scratch, 'output.txt')
+    bridge.save_to_file(text_file)
+    bridge.save_binary(binary_file, include_forces=False)
+
+    # Fewer repeats for the big trusses, they are slow enough to time in one go
+    repeat = max(1, repeat if bridge.num_members <= 10000 else 1)
+
+    def load():
+        loaded = Bridge()
+        loaded.output = None
+        loaded.load_from_file(text_file)
+        return loaded
+
+    def load_binary():
+        loaded = Bridge()
+        loaded.output = None
+        loaded.load_from_file(binary_file)
+        return loaded
+
+    def solve():
+        bridge._modified()  # Throw away the cached factorization
+        return bridge.solve()
+
+    bridge.validate()
+    timings = {}
+    timings['load'] = time_call(load, repeat)
+    timings['load_binary'] = time_call(load_binary, repeat)
+    timings['assemble'] = time_call(lambda: assemble_equilibrium(bridge), repeat)
+    matrix = timings['assemble'][2][0]
+    timings['factorize'] = time_call(lambda: Factorization(matrix).solve(load_vector(bridge, bridge.load_nodes, 1)), repeat)
+    timings['solve'] = time_call(solve, repeat)
+    timings['output'] = time_call(lambda: bridge.write_output_file(output_file), repeat)
+    if plot is not None and bridge.num_members <= max_plot_members:
+        timings['plot'] = time_call(lambda: plot(bridge), repeat)
+
+    size = {'truss': kind, 'target_members': members, 'members': bridge.num_members, 'nodes': bridge.num_nodes,
+            'nonzeros': int(matrix.nnz)}
+    results = []
+    for phase in PHASES:
+        if phase in timings:
+            median, best, _ = timings[phase]
+            results.append(dict(size, phase=phase, seconds=median, min_seconds=best, repeat=repeat))
+        else:
+            results.append(dict(size, phase=phase, seconds=None, min_seconds=None, repeat=0, skipped=True))
+    return results
+
+
+def benchmark_startup(scratch, repeat):
+    '''
+    Times a whole `python solve_bridge.py` run on a 10 member truss in a fresh interpreter,
+    which is dominated by starting Python and importing the solver.
+    '''
+    bridge_file = os.path.join(scratch, 'startup.txt')
+    bridge = generate('pratt', 10)
+    bridge.save_to_file(bridge_file)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solve_bridge.py')
+    command = [sys.executable, script, bridge_file]
+    median, best, _ = time_call(lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL), max(repeat, 3))
+    return {'truss': 'pratt', 'target_members': 10, 'members': bridge.num_members, 'nodes': bridge.num_nodes, 'phase': 'startup',
+            'seconds': median, 'min_seconds': best, 'repeat': max(repeat, 3),
+            'target_seconds': STARTUP_TARGET, 'meets_target': median <= STARTUP_TARGET}
+
+
+def run(kinds, sizes, repeat=3, max_plot_members=20000, callback=None):
+    plot = _plotter()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bridge-benchmark-') as scratch:
+        row = benchmark_startup(scratch, repeat)
+        results.append(row)
+        if callback is not None:
+            callback([row])
+        for kind in kinds:
+            for members in sizes:
+                rows = benchmark_truss(kind, members, repeat, scratch, plot, max_plot_members)
+                results.extend(rows)
+                if callback is not None:
+                    callback(rows)
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'plot': plot is not None,
+        },
+        'results': results,
+    }
+
+
+def _key(row):
+    return (row['truss'], row['target_members'], row['phase'])
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=1e-3):
+    '''
+    Ratio of every timing to the same truss, size and phase in the baseline.
+    A phase regressed if it got more than tolerance slower and takes at least min_seconds
+    (shorter timings are mostly noise). Returns a list of (row, baseline seconds, ratio, regressed).
+    '''
+    reference = {_key(row): row for row in baseline['results'] if row.get('seconds') is not None}
+    comparison = []
+    for row in results['results']:
+        old = reference.get(_key(row))
+        if old is None or row.get('seconds') is None:
+            continue
+        # Compare the best of the repeats, the median is pulled up by the occasional slow run
+        new_time = row['min_seconds']
+        old_time = old['min_seconds']
+        ratio = new_time / old_time if old_time > 0 else float('inf')
+        regressed = ratio > 1 + tolerance and new_time >= min_seconds
+        comparison.append((row, old_time, ratio, regressed))
+    return comparison
+
+
+def _print_rows(rows):
+    for row in rows:
+        if row.get('seconds') is None:
+            continue
+        print(f"{row['truss']:>7} {row['members']:>7} members  {row['phase']:<12} {row['seconds'] * 1000:10.2f} ms", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time loading, assembling, solving, writing and plotting generated trusses.')
+    parser.add_argument('-o', '--output', help='JSON file for the results (default: stdout)')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='slowdown counted as a regression (default: 0.25 = 25%%)')
+    parser.add_argument('--truss', nargs='+', choices=sorted(GENERATORS), default=['pratt', 'howe', 'warren', 'k'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help='approximate numbers of members')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-plot-members', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    results = run(args.truss, args.sizes, args.repeat, args.max_plot_members, callback=_print_rows)
+    startup = results['results'][0]
+    if not startup['meets_target']:
+        print(f"Startup took {startup['seconds']:.3f} s, over the {STARTUP_TARGET} s target.", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=1)
+    elif not args.baseline:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+        comparison = compare(results, baseline, args.tolerance)
+        for row, old_time, ratio, regressed in comparison:
+            flag = '  REGRESSION' if regressed else ''
+            print(f"{row['truss']:>7} {row['members']:>7} members  {row['phase']:<12} {old_time * 1000:10.2f} -> {row['min_seconds'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+        if any(regressed for _, _, _, regressed in comparison):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
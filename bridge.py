@@ -1,53 +1,489 @@
+import gc
+import itertools
+import logging
 import math
-import pandas as pd
-import matplotlib.pyplot as plt
 
 import numpy as np
-import numpy.linalg as lin
+
+from bridge_binary import is_binary_file, read_binary, write_binary
+import metrics
+from output import ResultWriter
+from results import SolveResult
+from solver import (RESIDUAL_TOLERANCE, Factorization, assemble_equilibrium, column_entries, estimate_condition, load_vector,
+                    numerical_rank, update_factorization)
+
+
+MAX_MEMBER_FORCE = 500000  # Internal force at which a member fails
+
+DEFAULT_ELASTIC_MODULUS = 1.0  # Displacements are in coordinate units per unit of E; set the bridge's own to get real ones
+DEFAULT_AREA = 1.0
+
+SOLVE_METHODS = ('equilibrium', 'stiffness')  # See solver.py and stiffness.py
+
+MECHANISM_ERROR = ('The truss is a mechanism, it can move without stretching any member '
+                   '(for example nodes in a line that are only joined along that line).')
+
+SOLVER_ERROR = ("The solution doesn't balance the load to working precision: the equilibrium equations are too badly "
+                'conditioned to trust the forces.')
+
+STIFFNESS_ERROR = ('The stiffness matrix is singular to working precision: the truss is a mechanism, or too slender '
+                   "for the stiffness method (try method='equilibrium').")
+
+logger = logging.getLogger(__name__)
 
 
 class Bridge():
     def __init__(self):
         self.name = 'Bridge'
-        self.nodes = []
-        self.members = []
-        self.num_nodes = 0
-        self.num_members = 0
-        self.num_displacements = 0
+        self.nodes = []  # Node views, in the same order as the node arrays
+        self.members = []  # Member views, in the same order as the member arrays
         self.left_node = None
         self.right_node = None
+
+        # Structure-of-arrays storage. The arrays are over-allocated and grown by doubling,
+        # only the first len(self.nodes) / len(self.members) rows are in use.
+        self._coordinates = np.zeros((16, 2))  # x, y of every node
+        self._supports = np.zeros((16, 2), dtype=bool)  # horizontal, vertical support of every node
+        self._member_nodes = np.zeros((16, 2), dtype=np.intp)  # node A index, node B index of every member
+        self._member_properties = np.full((16, 2), np.nan)  # E, A of every member, NaN for the bridge's default
+
+        # Hash indexes, kept in sync by the add/remove/move methods
+        self._node_by_id = {}
+        self._node_by_position = {}  # (x, y) -> node
+        self._member_by_id = {}
+        self._member_by_pair = {}  # _pair_key(node A, node B) -> member, in either direction
+
+        # Bumped by every node, member and support change. Anything derived from the geometry
+        # (the factorized equilibrium matrix, the solution) remembers the version it was computed at.
+        self.version = 0
+        self._factorization = None
+        self._factorization_version = -1
+        self._base_factorization = None  # Last full LU, its columns and column entries, the starting point of incremental solves
+        self._stiffness = None
+        self._stiffness_version = -1
+        self._equilibrium = None
+        self._node_index = None
+        self._equilibrium_version = -1
+        self._solved_version = -1
         
-        self.is_solved = False        
         self.load = 0
-        self.internal_forces = None
         self.efficiency = 0      
-        self.broken_members = None  
+        self.load_nodes = []  # Roadway nodes carrying the load, set by validate
+
+        # Solution of the last solve as NumPy arrays, see results.py. The pandas versions
+        # (internal_forces, broken_members) are only built when asked for, so solving never imports pandas.
+        self.result = None
+        self._internal_forces = None
+        self._broken_members = None
+
+        # Where solve writes its results, None to skip writing them
+        self.output = ResultWriter('./output.txt')
+
+        # Statically indeterminate trusses get the minimum norm solution, set to False to reject them instead
+        self.allow_redundant = True
+
+        # How solve solves the truss, one of SOLVE_METHODS: 'equilibrium' solves for the forces directly,
+        # 'stiffness' solves for the displacements with the direct stiffness method (see stiffness.py), which shares
+        # the load of redundant members by their stiffness E A / L. E and A are these unless a member has its own.
+        self.method = 'equilibrium'
+        self.elastic_modulus = DEFAULT_ELASTIC_MODULUS
+        self.area = DEFAULT_AREA
+
+        # Instrumentation, see metrics.py
+        self.collect_metrics = False
+        self.solve_report = None
+
+    @property
+    def internal_forces(self):
+        '''
+        pandas Series of the member forces at the max load, indexed 'F<member id>'.
+        '''
+        if self._internal_forces is None and self.result is not None:
+            import pandas as pd
+            self._internal_forces = pd.Series(self.result.forces, index=self._force_labels())
+        return self._internal_forces
+
+    @property
+    def broken_members(self):
+        '''
+        pandas Series of the forces (under the solved load) of the critical members, indexed 'F<member id>'.
+        '''
+        if self._broken_members is None and self.result is not None:
+            import pandas as pd
+            labels = self._force_labels()
+            critical = self.result.critical
+            self._broken_members = pd.Series(self.result.unit_forces[critical], index=[labels[i] for i in critical])
+        return self._broken_members
+
+    def _force_labels(self):
+        return ['F' + member.id for member in self.result.members]
+
+    def get_result(self):
+        '''
+        SolveResult of the last solve (None before solving).
+        '''
+        return self.result
+
+    def get_member_forces(self):
+        '''
+        Array of the member forces at the max load from the last solve, in member order (None before solving).
+        '''
+        return None if self.result is None else self.result.forces
+
+    def get_critical_members(self):
+        '''
+        Indices of the members that fail first, from the last solve (None before solving).
+        '''
+        return None if self.result is None else self.result.critical
+
+    def _set_solution(self, unit_forces, load=None, unit_reactions=None, unit_displacements=None):
+        # Stores the member forces of a solve. The critical members are the ones within 0.1% of the largest force,
+        # and the max load (unless given) is the load that brings them to MAX_MEMBER_FORCE.
+        abs_forces = np.abs(unit_forces)
+        critical = np.flatnonzero(np.isclose(abs_forces, abs_forces.max(), rtol=1e-03, atol=1e-03, equal_nan=False))
+        self.load = MAX_MEMBER_FORCE / abs(unit_forces[critical].max()) if load is None else load
+        self.result = SolveResult(list(self.members), list(self.nodes), self.get_supports().copy(), unit_forces, critical,
+                                  self.load, self.get_total_length(), unit_reactions, unit_displacements)
+        self._internal_forces = None
+        self._broken_members = None
+        self.efficiency = self.result.efficiency
+        self.is_solved = True
+
+    def snapshot(self):
+        '''
+        Copies of the arrays, IDs and settings of the bridge, quick to take even for big bridges.
+        Bridge.from_snapshot builds an independent bridge from them, which is the slow part and can run on another thread.
+        '''
+        count = len(self.nodes)
+        return {
+            'coordinates': self._coordinates[:count].copy(),
+            'supports': self._supports[:count].copy(),
+            'member_nodes': self.get_member_nodes().copy(),
+            'member_properties': self._member_properties[:len(self.members)].copy(),
+            'node_ids': [node.id for node in self.nodes],
+            'member_ids': [member.id for member in self.members],
+            'name': self.name,
+            'allow_redundant': self.allow_redundant,
+            'method': self.method,
+            'elastic_modulus': self.elastic_modulus,
+            'area': self.area,
+            'collect_metrics': self.collect_metrics,
+            'base_factorization': self._base_factorization,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        '''
+        New bridge, without a solution or output file, from a snapshot(). It shares the snapshot's last full factorization,
+        so an incremental solve of the copy costs the same as one of the original.
+        '''
+        bridge = cls()
+        bridge._install_arrays(snapshot)
+        bridge.name = snapshot['name']
+        bridge.allow_redundant = snapshot['allow_redundant']
+        bridge.method = snapshot['method']
+        bridge.elastic_modulus = snapshot['elastic_modulus']
+        bridge.area = snapshot['area']
+        bridge.collect_metrics = snapshot['collect_metrics']
+        bridge._base_factorization = snapshot['base_factorization']
+        bridge.output = None
+        return bridge
+
+    def copy(self):
+        '''
+        Independent copy of the nodes, members and supports, without the solution.
+        '''
+        return Bridge.from_snapshot(self.snapshot())
+
+    def adopt_solution(self, solved, version):
+        '''
+        Takes over the solution of solved, a copy() (or from_snapshot) made when this bridge was at version.
+        Returns False, leaving the bridge unsolved, if it changed since then (the solution is stale) or solved isn't solved.
+        '''
+        if self.version != version or not solved.is_solved:
+            return False
+        result = solved.result
+        self.load_nodes = [self.nodes[node.index] for node in solved.load_nodes]
+        self._set_solution(result.unit_forces, result.max_load, result.unit_reactions, result.unit_displacements)
+        if solved._factorization_version == solved.version:
+            self._factorization = solved._factorization
+            self._factorization_version = self.version
+        self._base_factorization = solved._base_factorization
+        self.solve_report = solved.solve_report
+        return True
+
+    def _unit_reactions(self, solution):
+        # (num_nodes x 2) reactions from the reaction unknowns of a solution, 0 where a node isn't supported
+        reactions = np.zeros(2 * self.num_nodes)
+        reactions[np.flatnonzero(self.get_supports().ravel())] = solution[self.num_members:]
+        return reactions.reshape(-1, 2)
+
+    @property
+    def is_solved(self):
+        return self._solved_version == self.version
+
+    @is_solved.setter
+    def is_solved(self, val):
+        self._solved_version = self.version if val else -1
+
+    def _modified(self):
+        self.version += 1
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_members(self):
+        return len(self.members)
+
+    @property
+    def num_displacements(self):
+        return int(self.get_supports().sum())
+
+    def get_coordinates(self):
+        '''
+        (num_nodes x 2) array of node coordinates. Treat it as read-only, move nodes with move_node
+        so the indexes and the version stay in sync.
+        '''
+        return self._coordinates[:len(self.nodes)]
+
+    def get_supports(self):
+        '''
+        (num_nodes x 2) boolean array of the horizontal and vertical supports.
+        '''
+        return self._supports[:len(self.nodes)]
+
+    def get_member_nodes(self):
+        '''
+        (num_members x 2) array with the indices of node A and node B of every member.
+        '''
+        return self._member_nodes[:len(self.members)]
+
+    def get_member_properties(self):
+        '''
+        Returns (E, A) arrays with the elastic modulus and cross-section area of every member,
+        the bridge's elastic_modulus and area where a member doesn't have its own.
+        '''
+        properties = self._member_properties[:len(self.members)]
+        elastic_modulus = np.where(np.isnan(properties[:, 0]), self.elastic_modulus, properties[:, 0])
+        area = np.where(np.isnan(properties[:, 1]), self.area, properties[:, 1])
+        return elastic_modulus, area
+
+    def get_axial_stiffness(self):
+        '''
+        E A / L of every member.
+        '''
+        elastic_modulus, area = self.get_member_properties()
+        return elastic_modulus * area / self.get_member_lengths()
+
+    def get_member_lengths(self):
+        '''
+        Lengths of all the members, computed in one vectorized pass.
+        '''
+        delta = self.get_member_vectors()
+        return np.hypot(delta[:, 0], delta[:, 1])
 
+    def get_member_vectors(self):
+        '''
+        (num_members x 2) array of the vector from node A to node B of every member.
+        '''
+        coords = self.get_coordinates()
+        member_nodes = self.get_member_nodes()
+        return coords[member_nodes[:, 1]] - coords[member_nodes[:, 0]]
+
+    def get_direction_cosines(self):
+        '''
+        Returns (cos, sin) arrays of the direction from node A to node B of every member.
+        '''
+        delta = self.get_member_vectors()
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        return delta[:, 0] / length, delta[:, 1] / length
 
     def add_node(self, add_node):
-        for node in self.nodes:
-            if node.get_x() == add_node.get_x() and node.get_y() == add_node.get_y():
-                return
-        
-        self.num_nodes += 1
-        self.num_displacements += int(add_node.support_x) + int(add_node.support_y)
-        self.nodes.append(add_node)
+        self.add_nodes([add_node])
+
+    def add_nodes(self, nodes):
+        '''
+        Adds many nodes, writing them into the arrays in one go.
+        Nodes at the position or with the ID of an existing node are skipped.
+        '''
+        added = []
+        values = []
+        for node in nodes:
+            x = node.get_x()
+            y = node.get_y()
+            if (x, y) in self._node_by_position or node.get_id() in self._node_by_id:
+                continue
+            self._node_by_id[node.get_id()] = node
+            self._node_by_position[(x, y)] = node
+            added.append(node)
+            values.append((x, y, node.get_support_x(), node.get_support_y()))
+
+        if not added:
+            return
+
+        start = len(self.nodes)
+        end = start + len(added)
+        values = np.array(values, dtype=float).reshape(-1, 4)
+        self._coordinates = _grow(self._coordinates, end)
+        self._supports = _grow(self._supports, end)
+        self._coordinates[start:end] = values[:, :2]
+        self._supports[start:end] = values[:, 2:] != 0
+
+        for index, node in enumerate(added, start):
+            node.bridge = self
+            node.index = index
+        self.nodes.extend(added)
+        self._modified()
     
     def remove_node(self, node):
-        self.num_nodes -= 1
-        self.nodes.remove(node)
+        '''
+        Removes the node and every member that still uses it.
+        '''
+        index = node.index
+        incident = np.flatnonzero((self.get_member_nodes() == index).any(axis=1))
+        for member_index in incident[::-1]:
+            self.remove_member(self.members[member_index])
+
+        del self._node_by_id[node.get_id()]
+        if self._node_by_position.get((node.get_x(), node.get_y())) is node:
+            del self._node_by_position[(node.get_x(), node.get_y())]
+
+        # Detach the view, keeping a copy of its values
+        node.detach()
+
+        # Shift the rows after the removed node up by one
+        count = len(self.nodes)
+        self._coordinates[index:count - 1] = self._coordinates[index + 1:count]
+        self._supports[index:count - 1] = self._supports[index + 1:count]
+        del self.nodes[index]
+        for other in self.nodes[index:]:
+            other.index -= 1
+
+        member_nodes = self.get_member_nodes()
+        member_nodes[member_nodes > index] -= 1
+        self._modified()
 
     def add_member(self, member):
-        self.num_members += 1
-        if member not in self.members:
-            self.members.append(member)
+        self.add_members([member])
+
+    def add_members(self, members):
+        '''
+        Adds many members, writing them into the arrays in one go.
+        Members between already connected nodes or with the ID of an existing member are skipped.
+        '''
+        for member in members:
+            if member.A is None or member.A.bridge is not self or member.B is None or member.B.bridge is not self:
+                raise ValueError(f"Member {member.get_id()} connects nodes that are not in the bridge.")
+
+        added = []
+        ends = []
+        properties = []
+        for member in members:
+            pair = _pair_key(member.A, member.B)
+            if pair in self._member_by_pair or member.get_id() in self._member_by_id:
+                continue
+            self._member_by_id[member.get_id()] = member
+            self._member_by_pair[pair] = member
+            added.append(member)
+            ends.append((member.A.index, member.B.index))
+            properties.append((member._elastic_modulus, member._area))
+
+        if not added:
+            return
+
+        start = len(self.members)
+        end = start + len(added)
+        self._member_nodes = _grow(self._member_nodes, end)
+        self._member_nodes[start:end] = ends
+        self._member_properties = _grow(self._member_properties, end)
+        self._member_properties[start:end] = np.array(properties, dtype=float)  # None -> NaN
+
+        for index, member in enumerate(added, start):
+            member.bridge = self
+            member.index = index
+        self.members.extend(added)
+        self._modified()
 
     def remove_member(self, member):
-        self.num_members -= 1
-        self.members.remove(member)
+        member.detach_properties()
+        index = member.index
+        count = len(self.members)
+        self._member_nodes[index:count - 1] = self._member_nodes[index + 1:count]
+        self._member_properties[index:count - 1] = self._member_properties[index + 1:count]
+        del self.members[index]
+        for other in self.members[index:]:
+            other.index -= 1
+        del self._member_by_id[member.get_id()]
+        del self._member_by_pair[_pair_key(member.A, member.B)]
+        member.bridge = None
+        member.index = None
+        self._modified()
 
     def set_members(self, list_of_members):
-        self.members = list_of_members
+        for member in self.members:
+            member.detach_properties()
+            member.bridge = None
+            member.index = None
+
+        self.members = []
+        self._member_nodes = np.zeros((max(16, len(list_of_members)), 2), dtype=np.intp)
+        self._member_properties = np.full((max(16, len(list_of_members)), 2), np.nan)
+        self._member_by_id = {}
+        self._member_by_pair = {}
+        self._modified()
+        self.add_members(list_of_members)
+
+    def move_node(self, node, x, y):
+        '''
+        Moves a node to (x, y). Raises ValueError if another node is already there, nodes can't share a position.
+        '''
+        other = self._node_by_position.get((x, y))
+        if other is not None and other is not node:
+            raise ValueError(f"Can't move node {node.get_id()} onto node {other.get_id()} at ({x}, {y}).")
+        old = (node.get_x(), node.get_y())
+        if self._node_by_position.get(old) is node:
+            del self._node_by_position[old]
+        self._coordinates[node.index] = (x, y)
+        self._node_by_position[(x, y)] = node
+        self._modified()
+
+    def set_node_support(self, node, axis, val):
+        '''
+        Sets the horizontal (axis 0) or vertical (axis 1) support of a node.
+        '''
+        self._supports[node.index, axis] = bool(val)
+        self._modified()
+
+    def set_member_properties(self, member, elastic_modulus=None, area=None):
+        '''
+        Sets the elastic modulus and / or cross-section area of a member, for the stiffness method.
+        NaN goes back to the bridge's default.
+        '''
+        if elastic_modulus is not None:
+            self._member_properties[member.index, 0] = elastic_modulus
+        if area is not None:
+            self._member_properties[member.index, 1] = area
+        self._modified()
+
+    @classmethod
+    def from_arrays(cls, coordinates, supports, member_nodes, node_ids=None, member_ids=None):
+        '''
+        Builds a bridge from (n x 2) coordinates, (n x 2) supports and (m x 2) member node indices.
+        IDs default to 1..n and 1..m.
+        '''
+        bridge = cls()
+        if node_ids is None:
+            node_ids = range(1, len(coordinates) + 1)
+        if member_ids is None:
+            member_ids = range(1, len(member_nodes) + 1)
+
+        nodes = [Node(node_id, x, y, bool(support_x), bool(support_y))
+                 for node_id, (x, y), (support_x, support_y) in zip(node_ids, np.asarray(coordinates).tolist(), np.asarray(supports).tolist())]
+        bridge.add_nodes(nodes)
+        bridge.add_members([Member(member_id, nodes[a], nodes[b]) for member_id, (a, b) in zip(member_ids, np.asarray(member_nodes).tolist())])
+        return bridge
 
     def get_members(self):
         return self.members
@@ -56,89 +492,138 @@ class Bridge():
         return self.nodes
 
     def get_node(self, node_id):
-        for node in self.get_nodes():
-            if node.get_id() == node_id:
-                return node
+        return self._node_by_id.get(str(node_id))
+
+    def get_node_at(self, x, y):
+        return self._node_by_position.get((float(x), float(y)))
 
     def get_member(self, node_a, node_b):
-        for member in self.get_members():
-            if node_a.get_id() == member.get_nodeA().get_id() and node_b.get_id() == member.get_nodeB().get_id() or node_a.get_id() == member.get_nodeB().get_id() and node_b.get_id() == member.get_nodeA().get_id():
-                return member
+        return self._member_by_pair.get(_pair_key(node_a, node_b))
 
     def get_member_by_id(self, id):
-        for member in self.get_members():
-            if member.get_id() == id:
-                return member
+        return self._member_by_id.get(str(id))
+
+    def next_node_id(self):
+        '''
+        Smallest unused numeric node ID, starting at num_nodes + 1.
+        '''
+        node_id = len(self.nodes) + 1
+        while str(node_id) in self._node_by_id:
+            node_id += 1
+        return str(node_id)
+
+    def next_member_id(self):
+        '''
+        Smallest unused numeric member ID, starting at num_members + 1.
+        '''
+        member_id = len(self.members) + 1
+        while str(member_id) in self._member_by_id:
+            member_id += 1
+        return str(member_id)
             
     def load_from_file(self, filename):
-        # Load the file into an array of lines
+        '''
+        Reads a bridge written by save_to_file in a single pass over the file, adding nodes, members
+        and supports as their lines are read. Returns '' on success, or an error message naming the first bad line.
+        Binary files written by save_binary are recognized and handed to load_binary.
+        '''
+        if is_binary_file(filename):
+            return self.load_binary(filename)
+
         try:
-            with open(filename, 'r') as file:
-                lines = file.readlines()
+            file = open(filename, 'r')
         except Exception:
             print('Corrupted/invalid file')
             return 'Failed to read file.'
-        
-        # Set the bridge name (from the first line of the input file)
-        # name = lines[0].split(' ')[0]
 
-        # Get the number of nodes and members
+        with file:
+            try:
+                return self._parse(file)
+            except UnicodeDecodeError:
+                return 'Failed to read file.'
+
+    def _parse(self, file):
+        # One pass over the lines. Outside a section the parser only looks for section headings,
+        # each heading then consumes its own lines from the same iterator:
+        #   Node position -> column headings -> num_nodes node lines
+        #   Elements -> column headings -> num_members member lines
+        #   Displacements -> count line -> column headings -> count support lines
+        lines = enumerate(file, 1)
+        line_number = 0
+
+        # Number of nodes and members
         try:
-            num_nodes = lines[1].split(' ')[0]
-            num_members = lines[2].split(' ')[0]
-        except Exception:
+            next(lines)  # Bridge name
+            line_number, line = next(lines)
+            num_nodes = int(line.split(' ')[0])
+            line_number, line = next(lines)
+            num_members = int(line.split(' ')[0])
+        except (StopIteration, ValueError):
+            if line_number:
+                return f"Corrupt / invalid file. Failed to read number of nodes and members (line {line_number})."
             return 'Corrupt / invalid file. Failed to read number of nodes and members.'
 
+        found = set()
+        for line_number, line in lines:
+            if 'Node position' in line:
+                section = 'Failed to add nodes'
+                try:
+                    next(lines)  # Column headings
+                    nodes = []
+                    for line_number, line in itertools.islice(lines, num_nodes):
+                        row = line.split()
+                        nodes.append(Node(row[0], float(row[1]), float(row[2]), False, False))
+                    if len(nodes) < num_nodes:
+                        raise StopIteration
+                except (StopIteration, IndexError, ValueError):
+                    return f"Corrupt / invalid file. {section} (line {line_number})."
+                self.add_nodes(nodes)
+                found.add(section)
 
-        # Search for Locations of Key Inputs
-        for i, s in enumerate(lines):
-            if 'Node position' in s:  # Location of Nodes
-                node_position = i
-            elif 'Elements' in s:  # Location of Members
-                element_position = i
-            elif 'Displacements' in s:  # Location of X-Y Displacements
-                displacement_position = i
-        
+            elif 'Elements' in line:
+                section = "Couldn't find members"
+                get_node = self._node_by_id.get
+                try:
+                    next(lines)  # Column headings
+                    members = []
+                    for line_number, line in itertools.islice(lines, num_members):
+                        row = line.split()
+                        node_a = get_node(row[1])
+                        node_b = get_node(row[2])
+                        if node_a is None or node_b is None:
+                            raise ValueError
+                        members.append(Member(row[0], node_a, node_b))
+                    if len(members) < num_members:
+                        raise StopIteration
+                except (StopIteration, IndexError, ValueError):
+                    return f"Corrupt / invalid file. {section} (line {line_number})."
+                self.add_members(members)
+                found.add(section)
 
-        # Add Nodes
-        try:
-            for i in range(node_position+2, node_position+2+int(num_nodes)):
-                row = lines[i].split('\t')
-                id = str(row[0])
-                x = int(float(row[1]))
-                y = int(float(row[2]))
-                node = Node(id, x, y, False, False)
-                self.add_node(node)
-        except Exception as e:
-            return f"Corrupt / invalid file. Failed to add nodes."
-
-
-        # Add Members           
-        try: 
-            for i in range(element_position+2, element_position+2+int(num_members)):
-                row = lines[i].split('\t')
-
-                nodeA = self.get_node(row[1].strip())
-                nodeB = self.get_node(row[2].strip())
-                member = Member(row[0], nodeA, nodeB)
-                self.add_member(member)
-        except Exception:
-            return "Corrupt / invalid file. Couldn't find members."
+            elif 'Displacements' in line:
+                section = "Couldn't find displacements"
+                try:
+                    line_number, line = next(lines)
+                    num_displacements = int(line.split(' ')[0])
+                    next(lines)  # Column headings
+                    count = 0
+                    for line_number, line in itertools.islice(lines, num_displacements):
+                        row = line.split()
+                        node = self._node_by_id[row[0]]
+                        if row[1] == '1':
+                            node.set_support_x(True)
+                        elif row[1] == '2':
+                            node.set_support_y(True)
+                        count += 1
+                    if count < num_displacements:
+                        raise StopIteration
+                except (StopIteration, IndexError, KeyError, ValueError):
+                    return f"Corrupt / invalid file. {section} (line {line_number})."
+                found.add(section)
 
-        # Add Displacements
-        try:
-            num_displacements = int(lines[displacement_position+1].split(' ')[0])
-            for i in range(displacement_position+3, displacement_position + 3 + num_displacements):
-                row = lines[i].split('\t')
-                node = self.get_node(row[0])
-                if row[1] == '1':
-                    node.set_support_x(True)
-                    self.num_displacements += 1
-                elif row[1] == '2':
-                    node.set_support_y(True)
-                    self.num_displacements += 1
-        except Exception:
-            return "Corrupt / invalid file. Couldn't find displacements."
+        for section in ('Failed to add nodes', "Couldn't find members", "Couldn't find displacements"):
+            if section not in found:
+                return f"Corrupt / invalid file. {section}."
         return ''
 
     def save_to_file(self, outfile):
@@ -162,39 +647,151 @@ class Bridge():
                 if node.get_support_y():
                     file.write(str(node.get_id()) + '\t' + '2\t0' + '\n')
 
+    def save_binary(self, outfile, include_forces=True):
+        '''
+        Saves the bridge in the compact binary format of bridge_binary.py, with the solved
+        internal forces and max load if the bridge is solved and include_forces is set.
+        The elastic modulus and area of the bridge and of every member that has its own are saved too.
+        '''
+        forces = None
+        load = 0.0
+        if include_forces and self.is_solved:
+            forces = self.result.forces
+            load = self.load
+        properties = self._member_properties[:len(self.members)]
+        if np.isnan(properties).all():
+            properties = None  # Every member uses the bridge's
+        write_binary(outfile, self.get_coordinates(), self.get_supports(), self.get_member_nodes(),
+                     [node.get_id() for node in self.nodes], [member.get_id() for member in self.members], forces, load,
+                     properties, self.elastic_modulus, self.area)
+
+    def load_binary(self, filename, mmap=True):
+        '''
+        Replaces the bridge with one saved by save_binary. With mmap=True the node and member arrays
+        are copy-on-write memory maps of the file instead of copies, so opening a large bridge costs
+        little more than building the node and member views.
+        Returns '' on success, or an error message like load_from_file.
+        '''
+        try:
+            data = read_binary(filename, mmap)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            return f"Corrupt / invalid file. {e}"
+
+        coordinates = data['coordinates']
+        member_nodes = data['member_nodes']
+        num_nodes = len(coordinates)
+        num_members = len(member_nodes)
+        if len(data['node_ids']) != num_nodes or len(data['member_ids']) != num_members:
+            return 'Corrupt / invalid file. Wrong number of node or member IDs.'
+        if num_members and (member_nodes.min() < 0 or member_nodes.max() >= num_nodes):
+            return "Corrupt / invalid file. Couldn't find members."
+
+        text = self._install_arrays(data)
+        if text != '':
+            return text
+        if data['elastic_modulus'] is not None:
+            self.elastic_modulus = data['elastic_modulus']
+            self.area = data['area']
+
+        # Restore the solution, if the file has one
+        if data['forces'] is not None and data['load'] > 0:
+            self.load_nodes = self.get_load_nodes()
+            self._set_solution(np.asarray(data['forces']) / data['load'], data['load'])
+        return ''
+
+    def _install_arrays(self, data):
+        # Replaces the bridge with the coordinates, supports, member_nodes, node_ids and member_ids of data,
+        # using the arrays as they are. Returns '' or an error message like load_from_file.
+        coordinates = data['coordinates']
+        member_nodes = data['member_nodes']
+        num_nodes = len(coordinates)
+        num_members = len(member_nodes)
+
+        # Views pointing at the rows (memory-mapped for a binary file), without copying the values out. The cyclic
+        # garbage collector is paused meanwhile, otherwise it keeps rescanning the views as they are allocated and
+        # doubles the load time.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            nodes, members, indexes = self._build_views(data)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        node_by_id, node_by_position, member_by_id, member_by_pair = indexes
+        if len(node_by_id) != num_nodes or len(node_by_position) != num_nodes:
+            return 'Corrupt / invalid file. Duplicate nodes.'
+        if len(member_by_id) != num_members or len(member_by_pair) != num_members:
+            return 'Corrupt / invalid file. Duplicate members.'
+
+        for node in self.nodes:
+            node.detach()
+        for member in self.members:
+            member.detach_properties()
+            member.bridge = None
+            member.index = None
+
+        self.nodes = nodes
+        self.members = members
+        self._coordinates = coordinates
+        self._supports = data['supports']
+        self._member_nodes = member_nodes
+        self._member_properties = data.get('member_properties')
+        if self._member_properties is None:
+            self._member_properties = np.full((num_members, 2), np.nan)
+        self._node_by_id = node_by_id
+        self._node_by_position = node_by_position
+        self._member_by_id = member_by_id
+        self._member_by_pair = member_by_pair
+        self._base_factorization = None
+        self._modified()
+        return ''
+
+    def _build_views(self, data):
+        # Node and member views plus the hash indexes for the arrays read by load_binary
+        node_ids = data['node_ids']
+        nodes = [Node(node_id, 0, 0, False, False) for node_id in node_ids]
+        for index, node in enumerate(nodes):
+            node.bridge = self
+            node.index = index
+        ends = np.asarray(data['member_nodes']).tolist()
+        members = [Member(member_id, nodes[a], nodes[b]) for member_id, (a, b) in zip(data['member_ids'], ends)]
+        for index, member in enumerate(members):
+            member.bridge = self
+            member.index = index
+
+        node_by_id = dict(zip(node_ids, nodes))
+        node_by_position = dict(zip(map(tuple, np.asarray(data['coordinates']).tolist()), nodes))
+        member_by_id = dict(zip(data['member_ids'], members))
+        member_by_pair = {}
+        for member, (a, b) in zip(members, ends):
+            a = node_ids[a]
+            b = node_ids[b]
+            member_by_pair[(a, b) if a <= b else (b, a)] = member  # _pair_key
+        return nodes, members, (node_by_id, node_by_position, member_by_id, member_by_pair)
+
     def get_load_nodes(self):
         # The load is distributed on every node along the roadway (y=0) of the truss, except for the far left and far right nodes
-        
-        smallest_val = float('inf')
-        smallest_node = None
+        coords = self.get_coordinates()
+        roadway = np.flatnonzero(coords[:, 1] == 0)
 
-        biggest_val = float('-inf')
-        biggest_node = None
+        if len(roadway) == 0:
+            self.left_node = None
+            self.right_node = None
+            return []
 
-        for node in self.get_nodes():
-            if node.get_y() == 0:
-                if node.get_x() < smallest_val:
-                    smallest_val = node.get_x()
-                    smallest_node = node
-                elif node.get_x() > biggest_val:
-                    biggest_val = node.get_x()
-                    biggest_node = node
-
-        self.left_node = smallest_node
-        self.right_node = biggest_node
-        return [node for node in self.get_nodes() if node is not biggest_node and node is not smallest_node and node.get_y() == 0]
+        self.left_node = self.nodes[roadway[np.argmin(coords[roadway, 0])]]
+        self.right_node = self.nodes[roadway[np.argmax(coords[roadway, 0])]]
+        return [self.nodes[i] for i in roadway if self.nodes[i] is not self.left_node and self.nodes[i] is not self.right_node]
 
     def get_total_length(self):
-        total = 0
-        for member in self.get_members():
-            total += member.get_length()
-        return total
+        return float(self.get_member_lengths().sum())
 
-    def solve(self, load=1):
+    def validate(self):
+        '''
+        Checks the supports of the bridge. Returns an error message, or '' if the bridge can be solved.
+        '''
         self.load_nodes = self.get_load_nodes()
-        
-        # BEGIN VALIDATION CHECKS
-        
+
         if len(self.load_nodes) < 1:
             return 'There are not enough support nodes.'
         
@@ -206,139 +803,576 @@ class Bridge():
 
 
             # Check that only support nodes are pinned
-        for node in self.get_nodes():
-            if node not in [self.left_node, self.right_node]:
-                if (node.get_support_x() or node.get_support_y()) and node.get_y() > 0:
-                    return 'Only support nodes should be pinned.'
-        # END VALIDATION CHECKS
+        pinned_above_roadway = self.get_supports().any(axis=1) & (self.get_coordinates()[:, 1] > 0)
+        pinned_above_roadway[[self.left_node.index, self.right_node.index]] = False
+        if pinned_above_roadway.any():
+            return 'Only support nodes should be pinned.'
+        return ''
 
-        
-        # Construct the matrix (excluding the constraints)        
-        matrix_headers = []  # Rows are the nodes, x and y component for each.
-        
-        for node in self.get_nodes():
-            matrix_headers.append(str(node.get_id()) + 'x')
-            matrix_headers.append(str(node.get_id()) + 'y')
-        
-        columns = ['F' + str(i.get_id()) for i in self.members]  # Columns are the member's internal forces
-    
-        matrix = pd.DataFrame(0, columns=columns, index=matrix_headers)
+    def get_equilibrium(self, report=metrics.NULL_REPORT):
+        '''
+        The equilibrium matrix and its column labels (see solver.assemble_equilibrium), cached until the next change to the bridge.
+        '''
+        if self._equilibrium_version != self.version:
+            with report.phase('assemble'):
+                self._equilibrium = assemble_equilibrium(self)
+            self._equilibrium_version = self.version
+        return self._equilibrium
 
-        # Add the support reactions to the matrix (vertical and horizontal get different reactions)
+    def get_node_index(self):
+        '''
+        NodeIndex (see node_index.py) over the current node positions, for picking nodes by position.
+        Only rebuilt when a node was added, moved or removed since the last call.
+        '''
+        index = self._node_index
+        if index is None or index.version != self.version:
+            from node_index import NodeIndex  # scipy.spatial is only needed by the GUI
+            coordinates = self.get_coordinates()
+            if index is None or not np.array_equal(index.coordinates, coordinates):
+                index = self._node_index = NodeIndex(coordinates)
+            index.version = self.version
+        return index
 
-        for node in self.get_nodes():
-            if node.get_support_x():
-                columns.append('R' + str(node.get_id()) + 'x')
-                matrix.loc[node.get_id() + 'x', 'R' + str(node.get_id()) + 'x'] = 1
-            if node.get_support_y():
-                columns.append('R' + str(node.get_id()) + 'y')
-                matrix.loc[node.get_id() + 'y', 'R' + str(node.get_id()) + 'y'] = 1
+    def check(self, report=metrics.NULL_REPORT):
+        '''
+        Cheap checks for trusses that can't carry the load, run after validate and before anything is factorized
+        (see analysis.py): the counting rule, connectivity, and for statically indeterminate trusses a structural
+        rank check, which also rejects them if allow_redundant is False.
+        Returns an error message, or '' if the truss is worth factorizing.
+        '''
+        import analysis
 
-        matrix = matrix.fillna(0)  # Replace empty values with 0
+        with report.phase('check'):
+            text = analysis.check_counting_rule(self)
+            if text == '':
+                text = analysis.check_connectivity(self)
+        if text != '' or analysis.counting_rule(self) == 0:
+            # A square system goes straight to the LU, which is as fast as the structural check
+            # and tells a singular (mechanism) matrix apart on its own
+            return text
 
-        for member in self.members:
-            a = member.get_nodeA()
-            b = member.get_nodeB()
+        # More unknowns than equations: check the structure before factorizing the bigger augmented system
+        matrix, columns = self.get_equilibrium(report)
+        with report.phase('check'):
+            text, redundant = analysis.check_structure(self, matrix, columns)
+            if text == '' and not self.allow_redundant:
+                text = analysis.describe_redundant(columns, redundant)
+        report.count(redundant=len(redundant))
+        return text
 
-            a_horizontal = (b.get_x() - a.get_x()) / member.get_length()            
-            a_vertical = (b.get_y() - a.get_y()) / member.get_length()
-            
-            b_horizontal = (a.get_x() - b.get_x()) / member.get_length()
-            b_vertical = (a.get_y() - b.get_y()) / member.get_length()
-            
-            matrix.loc[a.get_id() + 'x', 'F' + str(member.get_id())] = a_horizontal
-            matrix.loc[a.get_id() + 'y', 'F' + str(member.get_id())] = a_vertical
-            
-            matrix.loc[b.get_id() + 'x', 'F' + str(member.get_id())] = b_horizontal
-            matrix.loc[b.get_id() + 'y', 'F' + str(member.get_id())] = b_vertical
+    def _check_factorization(self, factorization):
+        # A matrix (or augmented system) that can't be factorized is a mechanism. The structural check names the nodes
+        # that can move if it's down to which members are there, otherwise the geometry is to blame.
+        if not getattr(factorization, 'singular', False):
+            return ''  # LU, augmented LU or a valid low-rank update
+        import analysis
+        text, _ = analysis.check_structure(self, factorization.matrix, self.get_equilibrium()[1])
+        return text or MECHANISM_ERROR
 
+    def _check_residual(self, factorization, solution, rhs):
+        # An answer that doesn't balance the load (every column of it, for several load cases) is only called a mechanism
+        # if the numerical rank of the factorization shows one; otherwise the solve itself lost too many digits
+        matrix = factorization.matrix
+        residual = np.linalg.norm(matrix @ solution - rhs, axis=0)
+        if np.all(residual <= RESIDUAL_TOLERANCE * np.linalg.norm(rhs, axis=0)):
+            return ''
+        rank = numerical_rank(factorization)
+        if rank is not None and rank < matrix.shape[0]:
+            import analysis
+            text, _ = analysis.check_structure(self, matrix, self.get_equilibrium()[1])
+            return text or MECHANISM_ERROR
+        return SOLVER_ERROR
 
-        load_matrix = pd.Series(0, index=matrix.index)
-        for node in self.get_load_nodes():
-            load_matrix.loc[node.get_id() + 'y'] = load / len(self.load_nodes)
+    def get_factorization(self, incremental=False, report=metrics.NULL_REPORT):
+        '''
+        Assembles and factorizes the equilibrium matrix.
+        Returns the Factorization and the column labels of the matrix.
+        The result is cached until the next change to the bridge, so re-solving with a different load only costs a back-substitution.
 
+        With incremental=True, a bridge that changed by a few members, supports or node moves since the last full
+        factorization is solved as a low-rank update of it (see solver.update_factorization). If the update is too large
+        or ill-conditioned (for example the edit turned the truss into a mechanism), or the bridge is too small for it
+        to pay off, it falls back to a full factorization.
 
-        result = pd.Series(np.linalg.lstsq(matrix,load_matrix, rcond=None)[0], index=columns).filter(like='F')
-        
-        broken_members = result.where(np.isclose(result.abs(), result.abs().max(), rtol=1e-03, atol=1e-03, equal_nan=False)).dropna()
-        print(broken_members)
-        self.load = 500000 / abs(broken_members.max())
-        self.is_solved = True
-        self.internal_forces = result * self.load
-        self.efficiency = self.load / self.get_total_length()
-        self.broken_members = broken_members
+        report (a metrics.SolveReport) receives the assemble and factorize timings.
+        '''
+        if self._factorization_version != self.version:
+            matrix, columns = self.get_equilibrium(report)
+
+            with report.phase('factorize'):
+                factorization = None
+                kind = 'updated'
+                if incremental and self._base_factorization is not None:
+                    factorization = update_factorization(*self._base_factorization, matrix, columns, column_entries(self))
+
+                if factorization is None:
+                    factorization = Factorization(matrix)
+                    kind = 'lu'
+                    if factorization.lu is not None:
+                        self._base_factorization = (factorization, columns, column_entries(self))
+                    else:
+                        kind = 'augmented'
+
+            self._factorization = (factorization, columns)
+            self._factorization_version = self.version
+            report.count(factorization=kind)
+        else:
+            report.count(factorization='cached')
+        return self._factorization
+
+    def get_stiffness_factorization(self, report=metrics.NULL_REPORT):
+        '''
+        Assembles and factorizes the stiffness matrix (see stiffness.py), cached until the next change to the bridge
+        or its E and A settings. report (a metrics.SolveReport) receives the assemble and factorize timings.
+        '''
+        key = (self.version, self.elastic_modulus, self.area)
+        if self._stiffness_version != key:
+            import stiffness
 
-        self.write_output_file()
+            with report.phase('assemble'):
+                axial_stiffness = self.get_axial_stiffness()
+            with report.phase('factorize'):
+                self._stiffness = stiffness.StiffnessFactorization(self, axial_stiffness)
+            self._stiffness_version = key
+        return self._stiffness
+
+    def _check_stiffness(self, factorization):
+        # A singular stiffness matrix is a mechanism, named through the structure of the equilibrium matrix if it can be
+        if not factorization.singular:
+            return ''
+        import analysis
+        text, _ = analysis.check_structure(self, *self.get_equilibrium())
+        return text or STIFFNESS_ERROR
+
+    def solve(self, load=1, incremental=False, progress=None, method=None):
+        # progress(phase) is called as every phase of the solve starts (see metrics.ProgressReport);
+        # an exception raised from it stops the solve.
+        # method is one of SOLVE_METHODS, self.method by default; incremental only applies to the equilibrium method.
+        method = self.method if method is None else method
+        if method not in SOLVE_METHODS:
+            raise ValueError(f"Unknown solve method {method!r}, use one of {', '.join(SOLVE_METHODS)}.")
+
+        report = metrics.start_report(self, progress)
+        with report.phase('validate'):
+            text = self.validate()
+        if text == '':
+            text = self.check(report)
+        if text != '':
+            report.count(error=text)
+            metrics.finish_report(self, report)
+            return text
+
+        if method == 'stiffness':
+            return self._solve_stiffness(load, report)
+
+        # Build the equilibrium matrix (member forces and support reactions) and solve it
+        factorization, columns = self.get_factorization(incremental, report)
+        with report.phase('check'):
+            text = self._check_factorization(factorization)
+        if text == '':
+            with report.phase('solve'):
+                load_matrix = load_vector(self, self.load_nodes, load)
+                solution = factorization.solve(load_matrix)
+            with report.phase('check'):
+                text = self._check_residual(factorization, solution, load_matrix)
+        if text != '':
+            report.count(error=text)
+            metrics.finish_report(self, report)
+            return text
+
+        with report.phase('postprocess'):
+            self._set_solution(solution[:self.num_members], unit_reactions=self._unit_reactions(solution))
+        self._finish_solve(report)
+
+        if report.enabled:
+            with report.phase('diagnostics'):
+                self._count_metrics(report, factorization, solution, load_matrix)
+        metrics.finish_report(self, report)
         return ''
 
-    def write_output_file(self):
-        with open('./output.txt', 'w') as file:
-            file.write('Maximum Total Load of Bridge\n')
-            file.write(str(self.load) + '\n\n')
-            file.write('External Forces\n')
-            file.write('node#\tXreaction\tYreaction\n')
-            load_per_node = self.load / len(self.load_nodes)
-            for node in self.nodes:
-                if node in self.load_nodes:
-                    file.write(node.get_id() + '\t' + '0' + '\t' + str(load_per_node) + '\n')
-                else:
-                    file.write(node.get_id() + '\t' + '0' + '\t' + '0' + '\n')
-            file.write('\nInternal Forces\n')
-            self.internal_forces.to_csv(file, sep='\t', header=False)            
+    def _solve_stiffness(self, load, report):
+        # The rest of solve for method='stiffness': displacements first, then the forces and reactions from them
+        factorization = self.get_stiffness_factorization(report)
+        with report.phase('check'):
+            text = self._check_stiffness(factorization)
+        if text != '':
+            report.count(error=text)
+            metrics.finish_report(self, report)
+            return text
+
+        with report.phase('solve'):
+            load_matrix = load_vector(self, self.load_nodes, load)
+            displacements = factorization.solve(load_matrix)
+        with report.phase('postprocess'):
+            self._set_solution(factorization.member_forces(displacements),
+                               unit_reactions=factorization.reactions(displacements, load_matrix),
+                               unit_displacements=displacements.reshape(-1, 2))
+        self._finish_solve(report)
+
+        if report.enabled:
+            with report.phase('diagnostics'):
+                report.count(
+                    nodes=self.num_nodes,
+                    members=self.num_members,
+                    reactions=self.num_displacements,
+                    dofs=2 * self.num_nodes,
+                    unknowns=len(factorization.free),
+                    nonzeros=int(factorization.matrix.nnz),
+                    factorization='cholmod' if factorization.factor is not None else 'splu',
+                    max_load=float(self.load),
+                    efficiency=float(self.efficiency),
+                    critical_members=self.result.get_critical_ids(),
+                )
+        metrics.finish_report(self, report)
+        return ''
+
+    def _finish_solve(self, report):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Critical members of %s: %s', self.name, self.result.get_critical_ids())
+
+        with report.phase('output'):
+            if self.output is not None:
+                self.output.write(self)
+
+    def _count_metrics(self, report, factorization, solution, load_matrix):
+        matrix = factorization.matrix
+        report.count(
+            nodes=self.num_nodes,
+            members=self.num_members,
+            reactions=self.num_displacements,
+            dofs=2 * self.num_nodes,
+            unknowns=matrix.shape[1],
+            nonzeros=int(matrix.nnz),
+            rank=numerical_rank(factorization),
+            residual=float(np.linalg.norm(matrix @ solution - load_matrix)),
+            max_load=float(self.load),
+            efficiency=float(self.efficiency),
+            critical_members=self.result.get_critical_ids(),
+        )
+        if metrics.options['condition']:
+            report.count(condition=estimate_condition(factorization))
+
+    def solve_many(self, load_cases):
+        '''
+        Solves several load cases against one factorization of the equilibrium matrix.
+        load_cases is a (n_cases x 2*num_nodes) array, column 2*i is node i's x load and 2*i+1 its y load
+        (the same sign convention as solve, which puts the load on the y rows of the roadway nodes).
+
+        Returns (forces, critical_members, max_loads):
+            forces: (n_cases x num_members) internal forces for each load case as given
+            critical_members: index of the member with the largest force in each case
+            max_loads: total load each case can be scaled to before its critical member fails
+        Raises ValueError with the message solve would return if the truss can't be solved.
+        '''
+        text = self.validate() or self.check()
+        if text != '':
+            raise ValueError(text)
+
+        load_cases = np.atleast_2d(np.asarray(load_cases, dtype=float))
+        if load_cases.shape[1] != 2 * self.num_nodes:
+            raise ValueError(f"Load cases need {2 * self.num_nodes} columns, got {load_cases.shape[1]}.")
+
+        factorization, _ = self.get_factorization()
+        text = self._check_factorization(factorization)
+        if text != '':
+            raise ValueError(text)
+        rhs = load_cases.T
+        solution = factorization.solve(rhs)  # all cases in one back-substitution, for any shape of matrix
+        text = self._check_residual(factorization, solution, rhs)
+        if text != '':
+            raise ValueError(text)
+        forces = solution.T[:, :self.num_members]
+
+        abs_forces = np.abs(forces)
+        critical_members = abs_forces.argmax(axis=1)
+        max_loads = MAX_MEMBER_FORCE / abs_forces.max(axis=1) * np.abs(load_cases).sum(axis=1)
+        return forces, critical_members, max_loads
+
+    def get_influence_lines(self, subdivisions=0, axles=None):
+        '''
+        Member forces as a unit load, or a vehicle given as axles [(offset behind the lead axle, weight), ...],
+        travels along the roadway, with the envelopes and governing position (see influence.py).
+        All roadway nodes are solved in one back-substitution against the cached factorization.
+        Raises ValueError with the message solve would return if the truss can't be solved.
+        '''
+        text = self.validate() or self.check()
+        if text != '':
+            raise ValueError(text)
+
+        factorization, _ = self.get_factorization()
+        text = self._check_factorization(factorization)
+        if text != '':
+            raise ValueError(text)
+        import influence
+        return influence.influence_lines(self, factorization, subdivisions, axles, MAX_MEMBER_FORCE,
+                                         check=lambda solution, rhs: self._check_residual(factorization, solution, rhs))
+
+    def get_tolerance_analysis(self, runs=10000, sigma=0.1, seed=None, fixed=None, memory_budget=None):
+        '''
+        Monte Carlo analysis of the max load and efficiency with random errors in the node positions
+        (normal, standard deviation sigma), solved in batches (see tolerance.py). Returns a MonteCarloResult.
+        memory_budget caps the bytes per batch, tolerance.MEMORY_BUDGET if None.
+        Raises ValueError with the message solve would return if the nominal truss can't be solved.
+        '''
+        import tolerance
+
+        text = self.validate() or self.check()
+        if text != '':
+            raise ValueError(text)
+
+        factorization, _ = self.get_factorization()
+        rhs = load_vector(self, self.load_nodes, 1)
+        text = self._check_factorization(factorization) or self._check_residual(factorization, factorization.solve(rhs), rhs)
+        if text != '':
+            raise ValueError(text)
+        if memory_budget is None:
+            memory_budget = tolerance.MEMORY_BUDGET
+        return tolerance.monte_carlo(self, rhs, runs, sigma, seed, fixed, memory_budget, MAX_MEMBER_FORCE)
+
+    def get_progressive_collapse(self, max_steps=None):
+        '''
+        Takes the failing member out and re-solves until the truss is a mechanism, each step being a rank-one
+        downdate of the factorization (see collapse.py). Returns a CollapseSequence with the members in the order
+        they fail and the load at every step; max_steps stops it early.
+        '''
+        text = self.validate() or self.check()
+        if text != '':
+            raise ValueError(text)
+
+        factorization, _ = self.get_factorization()
+        text = self._check_factorization(factorization)
+        if text != '':
+            raise ValueError(text)
+        import collapse
+        return collapse.progressive_collapse(self, factorization, load_vector(self, self.load_nodes, 1),
+                                             MAX_MEMBER_FORCE, max_steps)
+
+    def get_sensitivities(self, incremental=False):
+        '''
+        Gradients of the critical member force, the max load and the efficiency with respect to every node's x and y,
+        from one adjoint solve that reuses the factorization of the equilibrium matrix.
+        When several members tie for critical the first one is used. Supported nodes are fixed, so their rows are zero,
+        and roadway nodes stay on the roadway, so their y entries are zero. Only statically determinate (square) trusses are supported.
+
+        Returns (critical_member, d_force, d_max_load, d_efficiency), the gradients being (num_nodes x 2) arrays.
+        '''
+        text = self.validate() or self.check()
+        if text != '':
+            raise ValueError(text)
+
+        factorization, _ = self.get_factorization(incremental)
+        if factorization.matrix.shape[0] != factorization.matrix.shape[1]:
+            raise ValueError('Sensitivities need a statically determinate truss (members + reactions = 2 * nodes).')
+        text = self._check_factorization(factorization)
+        if text != '':
+            raise ValueError(text)
+
+        forces = factorization.solve(load_vector(self, self.load_nodes, 1))[:self.num_members]
+        critical = int(np.abs(forces).argmax())
+
+        # Adjoint: A^T adjoint = e_critical, so d(force_critical) = -adjoint^T (dA) forces
+        unit = np.zeros(factorization.matrix.shape[1])
+        unit[critical] = 1
+        adjoint = factorization.solve_transpose(unit).reshape(-1, 2)  # one row per node
+
+        member_nodes = self.get_member_nodes()
+        delta = self.get_member_vectors()
+        lengths = np.hypot(delta[:, 0], delta[:, 1])
+        direction = delta / lengths[:, None]
+
+        # A member's column is (u, -u) on its end nodes, u = (B - A) / L, and du/d(B - A) = (I - u u^T) / L
+        adjoint_delta = adjoint[member_nodes[:, 0]] - adjoint[member_nodes[:, 1]]
+        along = (adjoint_delta * direction).sum(axis=1)
+        column_gradient = (adjoint_delta - along[:, None] * direction) / lengths[:, None]
+        term = -forces[:, None] * column_gradient
+
+        d_force = np.zeros((self.num_nodes, 2))
+        np.add.at(d_force, member_nodes[:, 1], term)
+        np.add.at(d_force, member_nodes[:, 0], -term)
+
+        # Total length: dL/dB = u, dL/dA = -u
+        d_length = np.zeros((self.num_nodes, 2))
+        np.add.at(d_length, member_nodes[:, 1], direction)
+        np.add.at(d_length, member_nodes[:, 0], -direction)
+
+        critical_force = forces[critical]
+        total_length = lengths.sum()
+        max_load = MAX_MEMBER_FORCE / abs(critical_force)
+        d_max_load = -max_load / critical_force * d_force
+        d_efficiency = d_max_load / total_length - max_load / total_length**2 * d_length
+
+        fixed = self.get_supports().any(axis=1)
+        roadway = self.get_coordinates()[:, 1] == 0
+        for gradient in (d_force, d_max_load, d_efficiency):
+            gradient[fixed] = 0
+            gradient[roadway, 1] = 0
+        return critical, d_force, d_max_load, d_efficiency
+
+    def write_output_file(self, destination='./output.txt', format=None):
+        '''
+        Writes the results of the last solve right away, in the output.txt format unless format
+        (or the extension of destination) says otherwise. See output.ResultWriter.
+        '''
+        ResultWriter(destination, format, background=False).write(self)
+
+
+def _pair_key(node_a, node_b):
+    # Members are undirected, so (A, B) and (B, A) share a key
+    a = node_a.get_id()
+    b = node_b.get_id()
+    return (a, b) if a <= b else (b, a)
+
+
+def _grow(array, size):
+    '''
+    Returns the array with room for at least size rows, doubling its capacity when it is full.
+    '''
+    if size <= len(array):
+        return array
+    grown = np.zeros((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
 
 
 class Node():
+    '''
+    Thin view of one node. Once the node is added to a bridge its coordinates and supports
+    live in the bridge's arrays, and index is its row in them.
+    '''
+    __slots__ = ('id', 'bridge', 'index', '_x', '_y', '_support_x', '_support_y')
+
     def __init__(self, node_id, xCoord, yCoord, xSupport, ySupport):
         assert 0 <= xSupport <= 1 and 0 <= ySupport <= 1  # Check that xSupport, ySupport are either 0 or 1 
         self.id = str(node_id)  # Convert the node ID to a string
-        self.x = float(xCoord)  
-        self.y = float(yCoord)
-        self.support_x = xSupport
-        self.support_y = ySupport
+        self.bridge = None
+        self.index = None
+        self._x = float(xCoord)  
+        self._y = float(yCoord)
+        self._support_x = bool(xSupport)
+        self._support_y = bool(ySupport)
+
+    def detach(self):
+        # Copy the values out of the bridge arrays before the node is removed from it
+        self._x = self.get_x()
+        self._y = self.get_y()
+        self._support_x = self.get_support_x()
+        self._support_y = self.get_support_y()
+        self.bridge = None
+        self.index = None
 
     def set_x(self, x_coord):
-        self.x = x_coord
+        if self.bridge is None:
+            self._x = float(x_coord)
+        else:
+            self.bridge.move_node(self, float(x_coord), self.get_y())
 
     def set_y(self, y_coord):
-        self.y = y_coord
+        if self.bridge is None:
+            self._y = float(y_coord)
+        else:
+            self.bridge.move_node(self, self.get_x(), float(y_coord))
 
     def set_support_x(self, val):
         assert(val == False or val == True)
-        self.support_x = val
+        if self.bridge is None:
+            self._support_x = bool(val)
+        else:
+            self.bridge.set_node_support(self, 0, val)
 
     def set_support_y(self, val):
         assert(val == False or val == True)
-        self.support_y = val
+        if self.bridge is None:
+            self._support_y = bool(val)
+        else:
+            self.bridge.set_node_support(self, 1, val)
 
     def get_support_x(self):
-        return self.support_x
+        if self.bridge is None:
+            return self._support_x
+        return bool(self.bridge._supports[self.index, 0])
 
     def get_support_y(self):
-        return self.support_y
+        if self.bridge is None:
+            return self._support_y
+        return bool(self.bridge._supports[self.index, 1])
 
 
     def get_x(self):
-        return self.x
+        if self.bridge is None:
+            return self._x
+        return float(self.bridge._coordinates[self.index, 0])
 
     def get_y(self):
-        return self.y
+        if self.bridge is None:
+            return self._y
+        return float(self.bridge._coordinates[self.index, 1])
 
     def get_id(self):
         return self.id
 
+    x = property(get_x, set_x)
+    y = property(get_y, set_y)
+    support_x = property(get_support_x, set_support_x)
+    support_y = property(get_support_y, set_support_y)
+
     def __str__(self):
-        return 'Node (ID: ' + self.get_id() + ') at (' + str(self.x) + ',' + str(self.y) +')\nLoad: ' + str(self.load) + '\nX-Support: ' + str(self.support_x) + '\nY-Support: ' + str(self.support_y) + '\n\n'
+        return 'Node (ID: ' + self.get_id() + ') at (' + str(self.x) + ',' + str(self.y) +')\nX-Support: ' + str(self.support_x) + '\nY-Support: ' + str(self.support_y) + '\n\n'
 
 
 class Member():
-    def __init__(self, member_id, nodeA, nodeB):
-        self.id = member_id
+    '''
+    Thin view of one member. Once the member is added to a bridge, index is its row in the bridge's member arrays.
+    '''
+    __slots__ = ('id', 'A', 'B', 'bridge', 'index', '_elastic_modulus', '_area')
+
+    def __init__(self, member_id, nodeA, nodeB, elastic_modulus=None, area=None):
+        self.id = str(member_id)
         self.A = nodeA
         self.B = nodeB
-        self.length = self.get_length
+        self.bridge = None
+        self.index = None
+        self._elastic_modulus = elastic_modulus  # None for the bridge's default
+        self._area = area
+
+    def detach_properties(self):
+        # Copy E and A out of the bridge arrays before the member is removed from it
+        self._elastic_modulus = self._own_property(0)
+        self._area = self._own_property(1)
+
+    def _own_property(self, column):
+        value = float(self.bridge._member_properties[self.index, column])
+        return None if math.isnan(value) else value
+
+    def get_elastic_modulus(self):
+        '''
+        Elastic modulus of the member, None if it uses the bridge's.
+        '''
+        if self.bridge is None:
+            return self._elastic_modulus
+        return self._own_property(0)
+
+    def get_area(self):
+        '''
+        Cross-section area of the member, None if it uses the bridge's.
+        '''
+        if self.bridge is None:
+            return self._area
+        return self._own_property(1)
+
+    def set_elastic_modulus(self, val):
+        if self.bridge is None:
+            self._elastic_modulus = val
+        else:
+            self.bridge.set_member_properties(self, elastic_modulus=math.nan if val is None else val)
+
+    def set_area(self, val):
+        if self.bridge is None:
+            self._area = val
+        else:
+            self.bridge.set_member_properties(self, area=math.nan if val is None else val)
 
     def get_length(self):
-        return math.sqrt(pow(self.B.y - self.A.y, 2) + pow(self.B.x - self.A.x, 2))
+        return math.hypot(self.B.get_x() - self.A.get_x(), self.B.get_y() - self.A.get_y())
 
     def get_nodeA(self):
         return self.A
@@ -347,4 +1381,4 @@ class Member():
         return self.B
 
     def get_id(self):
-        return self.id 
\ No newline at end of file
+        return self.id
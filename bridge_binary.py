@@ -0,0 +1,179 @@
+'''
+Compact binary bridge format (.brb) that can be opened with np.memmap instead of being parsed.
+
+Layout, little-endian, every section starting on an 8 byte boundary:
+    magic           8 bytes, MAGIC (the last byte is the format version)
+    header          num_nodes, num_members, node ID bytes, member ID bytes, flags (uint64),
+                    load, elastic modulus, area (float64, the bridge's defaults for the stiffness method)
+    coordinates     float64 (num_nodes x 2)
+    supports        bool (num_nodes x 2)
+    member nodes    int64 (num_members x 2), indices into the node arrays
+    forces          float64 (num_members), only if flags & HAS_FORCES
+    properties      float64 (num_members x 2), E and A of every member (NaN for the bridge's), only if flags & HAS_PROPERTIES
+    node IDs        UTF-8, newline separated
+    member IDs      UTF-8, newline separated
+Version 1 files, whose header ends at the load and which have no properties, are still read.
+
+Convert between the text and binary formats with
+    python bridge_binary.py my_bridge.txt my_bridge.brb
+    python bridge_binary.py my_bridge.brb my_bridge.txt
+'''
+import os
+import struct
+import sys
+
+import numpy as np
+
+
+MAGIC = b'BRIDGE\x00\x02'
+HEADERS = {b'BRIDGE\x00\x01': struct.Struct('<5Qd'), MAGIC: struct.Struct('<5Q3d')}  # magic -> header of that version
+HAS_FORCES = 1
+HAS_PROPERTIES = 2
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _layout(header, num_nodes, num_members, node_ids_size, member_ids_size, has_forces, has_properties):
+    # Offset of every section, plus the total file size
+    offsets = {}
+    offset = len(MAGIC) + header.size
+    for name, size in (('coordinates', num_nodes * 16),
+                       ('supports', num_nodes * 2),
+                       ('member_nodes', num_members * 16),
+                       ('forces', num_members * 8 if has_forces else 0),
+                       ('member_properties', num_members * 16 if has_properties else 0),
+                       ('node_ids', node_ids_size),
+                       ('member_ids', member_ids_size)):
+        offset = _align(offset)
+        offsets[name] = offset
+        offset += size
+    return offsets, offset
+
+
+def is_binary_file(filename):
+    try:
+        with open(filename, 'rb') as file:
+            return file.read(len(MAGIC)) in HEADERS
+    except OSError:
+        return False
+
+
+def write_binary(filename, coordinates, supports, member_nodes, node_ids, member_ids, forces=None, load=0.0,
+                 member_properties=None, elastic_modulus=1.0, area=1.0):
+    node_ids = '\n'.join(node_ids).encode('utf-8')
+    member_ids = '\n'.join(member_ids).encode('utf-8')
+    flags = (HAS_FORCES if forces is not None else 0) | (HAS_PROPERTIES if member_properties is not None else 0)
+    header = HEADERS[MAGIC]
+    offsets, size = _layout(header, len(coordinates), len(member_nodes), len(node_ids), len(member_ids),
+                            forces is not None, member_properties is not None)
+
+    sections = [
+        ('coordinates', np.ascontiguousarray(coordinates, dtype='<f8')),
+        ('supports', np.ascontiguousarray(supports, dtype=bool)),
+        ('member_nodes', np.ascontiguousarray(member_nodes, dtype='<i8')),
+        ('forces', None if forces is None else np.ascontiguousarray(forces, dtype='<f8')),
+        ('member_properties', None if member_properties is None else np.ascontiguousarray(member_properties, dtype='<f8')),
+        ('node_ids', node_ids),
+        ('member_ids', member_ids),
+    ]
+
+    # The arrays may be memory maps of the file being overwritten (a bridge loaded with mmap=True and saved
+    # back to the same path), so write a new file next to it and swap it in: the maps keep the old one
+    temp_name = f'{os.fspath(filename)}.{os.getpid()}.tmp'
+    try:
+        with open(temp_name, 'wb') as file:
+            file.write(MAGIC)
+            file.write(header.pack(len(coordinates), len(member_nodes), len(node_ids), len(member_ids), flags, float(load),
+                                   float(elastic_modulus), float(area)))
+            for name, data in sections:
+                if data is None:
+                    continue
+                file.write(b'\0' * (offsets[name] - file.tell()))  # padding
+                if isinstance(data, bytes):
+                    file.write(data)
+                else:
+                    data.tofile(file)
+            file.write(b'\0' * (size - file.tell()))
+        os.replace(temp_name, filename)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def read_binary(filename, mmap=True):
+    '''
+    Returns a dict with the arrays of a .brb file ('coordinates', 'supports', 'member_nodes', 'forces' and
+    'member_properties' or None), the ID lists ('node_ids', 'member_ids'), 'load', and the bridge's 'elastic_modulus'
+    and 'area' (None in a version 1 file).
+    With mmap=True the arrays are copy-on-write memory maps of the file, so nothing is read until it is used
+    and changes are never written back.
+    Raises ValueError if the file isn't a valid bridge binary file.
+    '''
+    with open(filename, 'rb') as file:
+        header = HEADERS.get(file.read(len(MAGIC)))
+        if header is None:
+            raise ValueError('Not a bridge binary file.')
+        try:
+            num_nodes, num_members, node_ids_size, member_ids_size, flags, load, *defaults = header.unpack(file.read(header.size))
+        except struct.error:
+            raise ValueError('Truncated bridge binary file.')
+        elastic_modulus, area = defaults or (None, None)
+
+        has_forces = bool(flags & HAS_FORCES)
+        has_properties = bool(flags & HAS_PROPERTIES)
+        offsets, size = _layout(header, num_nodes, num_members, node_ids_size, member_ids_size, has_forces, has_properties)
+        if file.seek(0, 2) < size:
+            raise ValueError('Truncated bridge binary file.')
+
+        file.seek(offsets['node_ids'])
+        node_ids = file.read(node_ids_size).decode('utf-8').split('\n') if num_nodes else []
+        file.seek(offsets['member_ids'])
+        member_ids = file.read(member_ids_size).decode('utf-8').split('\n') if num_members else []
+
+    def section(name, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        if mmap:
+            return np.memmap(filename, dtype=dtype, mode='c', offset=offsets[name], shape=shape)
+        return np.fromfile(filename, dtype=dtype, count=int(np.prod(shape)), offset=offsets[name]).reshape(shape)
+
+    return {
+        'coordinates': section('coordinates', '<f8', (num_nodes, 2)),
+        'supports': section('supports', bool, (num_nodes, 2)),
+        'member_nodes': section('member_nodes', '<i8', (num_members, 2)),
+        'forces': section('forces', '<f8', (num_members,)) if has_forces else None,
+        'member_properties': section('member_properties', '<f8', (num_members, 2)) if has_properties else None,
+        'node_ids': node_ids,
+        'member_ids': member_ids,
+        'load': load,
+        'elastic_modulus': elastic_modulus,
+        'area': area,
+    }
+
+
+def main(argv=None):
+    from bridge import Bridge
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print('Usage: python bridge_binary.py <input .txt/.brb> <output .txt/.brb>', file=sys.stderr)
+        return 2
+
+    bridge = Bridge()
+    text = bridge.load_from_file(argv[0])
+    if text != '':
+        print(text, file=sys.stderr)
+        return 1
+
+    if argv[1].endswith('.brb'):
+        bridge.save_binary(argv[1])
+    else:
+        bridge.save_to_file(argv[1])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+'''
+Draws a bridge on a matplotlib axes with a handful of artists that are updated in place:
+    members         one LineCollection, red before solving, afterwards coloured by force
+                    (blue = compression, red = tension, black = critical, green = zero-force)
+    nodes           one scatter, in the order of bridge.nodes
+    selected nodes  one green marker line, drawn with blitting so changing the selection doesn't redraw the truss
+    loads           one quiver with an arrow on every load node of a solved bridge
+    node labels     one text per node, left out above LABEL_LIMIT nodes where they'd only cover the truss
+
+Nothing here needs Qt, so the benchmarks draw on an off-screen figure with it.
+'''
+import numpy as np
+
+import matplotlib
+from matplotlib.collections import LineCollection
+
+
+LABEL_LIMIT = 200
+PICK_TOLERANCE = 5  # pixels
+LOAD_ARROW = 5.0  # length of the load arrows, in data units
+
+UNSOLVED_COLOR = (1.0, 0.0, 0.0, 1.0)
+CRITICAL_COLOR = (0.0, 0.0, 0.0, 1.0)
+ZERO_FORCE_COLOR = (0.0, 0.5, 0.0, 1.0)
+
+
+class BridgePlot():
+    def __init__(self, ax):
+        self.ax = ax
+        self.members = LineCollection([], linewidths=1.5, zorder=1)
+        ax.add_collection(self.members)
+        self.nodes = ax.scatter([], [], s=36, c='b', zorder=3)
+        self.selected, = ax.plot([], [], 'go', zorder=4, animated=True)
+        self.loads = None
+        self.labels = []
+        self.colormap = matplotlib.colormaps['bwr']
+
+        # Everything but the selection, saved after every full draw for blitting the selection onto
+        self.background = None
+        ax.figure.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def update(self, bridge, selected_nodes=(), preserve_zoom=False, result=None):
+        '''
+        Redraws bridge on the axes (the caller draws the canvas). With preserve_zoom the axes limits stay where they are,
+        otherwise they are fitted to the bridge. The members are coloured by result, a SolveResult with the same
+        members as the bridge, or by the bridge's own result if it is solved.
+        '''
+        coordinates = bridge.get_coordinates()
+        member_nodes = bridge.get_member_nodes()
+
+        self.members.set_segments(coordinates[member_nodes] if len(member_nodes) else [])
+        if result is None and bridge.is_solved:
+            result = bridge.get_result()
+        self.members.set_color(self.member_colors(bridge, result))
+        self.nodes.set_offsets(coordinates if len(coordinates) else np.empty((0, 2)))
+
+        self._set_selection(bridge, selected_nodes)
+        self.background = None  # Stale until the caller draws
+
+        self._update_loads(bridge, result is not None)
+        self._update_labels(bridge, coordinates)
+
+        if not preserve_zoom:
+            self.fit(coordinates)
+
+    def select(self, bridge, selected_nodes):
+        '''
+        Highlights selected_nodes, blitting the highlight onto the last full draw when the canvas can.
+        '''
+        self._set_selection(bridge, selected_nodes)
+        canvas = self.ax.figure.canvas
+        if self.background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.background)
+        self.ax.draw_artist(self.selected)
+        canvas.blit(self.ax.bbox)
+
+    def _set_selection(self, bridge, selected_nodes):
+        indices = [node.index for node in selected_nodes if node.bridge is bridge]
+        points = bridge.get_coordinates()[indices]
+        self.selected.set_data(points[:, 0], points[:, 1])
+
+    def _on_draw(self, event):
+        canvas = self.ax.figure.canvas
+        if getattr(canvas, 'supports_blit', False) and hasattr(canvas, 'copy_from_bbox'):
+            self.background = canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.selected)
+
+    def node_at(self, node_index, x_pixel, y_pixel, tolerance=PICK_TOLERANCE):
+        '''
+        Index of the node closest to the pixel position (x_pixel, y_pixel) of a mouse event, or -1 if none is
+        within tolerance pixels. node_index is the bridge's NodeIndex.
+        '''
+        # The tolerance in data units differs in x and y unless the axes are equal
+        to_data = self.ax.transData.inverted()
+        x, y = to_data.transform((x_pixel, y_pixel))
+        x_edge, y_edge = to_data.transform((x_pixel + tolerance, y_pixel + tolerance))
+        candidates = node_index.within(x, y, abs(x_edge - x), abs(y_edge - y))
+        if len(candidates) == 0:
+            return -1
+        pixels = self.ax.transData.transform(node_index.coordinates[candidates])
+        distances = np.hypot(pixels[:, 0] - x_pixel, pixels[:, 1] - y_pixel)
+        closest = distances.argmin()
+        return int(candidates[closest]) if distances[closest] <= tolerance else -1
+
+    def member_colors(self, bridge, result=None):
+        '''
+        RGBA colour of every member, from the forces of result, or red if there is none.
+        '''
+        if result is None:
+            return np.tile(UNSOLVED_COLOR, (bridge.num_members, 1))
+
+        max_force = np.abs(result.forces).max()
+        colors = self.colormap((result.forces + max_force) / (max_force * 2 + 0.000001))
+        colors[result.critical] = CRITICAL_COLOR
+        colors[result.zero] = ZERO_FORCE_COLOR
+        return colors
+
+    def _update_loads(self, bridge, solved):
+        # The quiver can't change its number of arrows, so it is replaced
+        if self.loads is not None:
+            self.loads.remove()
+            self.loads = None
+        load_nodes = [node.index for node in bridge.load_nodes if node.bridge is bridge] if solved else []
+        if not load_nodes:
+            return
+        positions = bridge.get_coordinates()[load_nodes]
+        count = len(positions)
+        self.loads = self.ax.quiver(positions[:, 0], positions[:, 1], np.zeros(count), np.full(count, -LOAD_ARROW),
+                                    angles='xy', scale_units='xy', scale=1, units='xy', width=0.5,
+                                    headwidth=4, headlength=2, headaxislength=2, zorder=2)
+
+    def _update_labels(self, bridge, coordinates):
+        for label in self.labels:
+            label.remove()
+        self.labels = []
+        if len(coordinates) > LABEL_LIMIT:
+            return
+        for node, (x, y) in zip(bridge.get_nodes(), coordinates.tolist()):
+            self.labels.append(self.ax.text(x, y + 2, node.get_id()))
+
+    def fit(self, coordinates):
+        '''
+        Fits the axes limits to the nodes and load arrows, like a fresh plot would.
+        '''
+        self.ax.set_autoscale_on(True)
+        self.ax.ignore_existing_data_limits = True
+        if len(coordinates):
+            self.ax.update_datalim(coordinates)
+        if self.loads is not None:
+            self.ax.update_datalim(self.loads.get_offsets() - [0, LOAD_ARROW])
+        self.ax.autoscale_view()
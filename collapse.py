@@ -0,0 +1,141 @@
+'''
+Progressive collapse: the critical member fails and is taken out, the damaged truss is solved again to find
+the next member to fail, and so on until what is left is a mechanism.
+
+Every state is solved like Bridge.solve solves the intact truss, with the minimum norm solution
+x = A^T (A A^T)^-1 b (A^-1 b for a statically determinate truss). Taking member j out removes its column a_j
+from A, which is a rank-one downdate of the Gram matrix G = A A^T:
+    G' = G - a_j a_j^T,     G'^-1 = G^-1 + y y^T / d,     y = G^-1 a_j,     d = 1 - a_j^T y
+So a step costs a few back-substitutions against the factorization of the intact truss (one for y, the rest
+for the solution and its iterative refinement) plus dense work on the y's of the members already gone, and the sequence
+is refactorized every REFACTOR_RANK steps to keep that work small. d is the part of member j that the rest of
+the truss can't take over: when it drops to 0 the member was holding the truss together and the next
+state is a mechanism. A statically determinate truss always gets there on its first failure.
+'''
+import numpy as np
+import scipy.sparse.linalg as spla
+
+
+REFACTOR_RANK = 64
+REFINE_STEPS = 3
+MECHANISM_TOLERANCE = 1e-8
+
+
+class CollapseSequence():
+    '''
+    Members in the order they fail, in the bridge's member order:
+        failed          index of the member failing at each step
+        loads           load each damaged state carries before its next member fails (loads[0] is the intact max load)
+        failure_loads   load at which each member actually fails: a state weaker than the load it was left with
+                        fails right away, so this is the running maximum of loads
+        ultimate_load   largest load the truss carries during the collapse
+        mechanism       True if the sequence ended in a mechanism, False if max_steps stopped it
+    '''
+    def __init__(self, members, failed, loads, mechanism):
+        self.members = members
+        self.failed = np.asarray(failed, dtype=np.intp)
+        self.loads = np.asarray(loads, dtype=float)
+        self.failure_loads = np.maximum.accumulate(self.loads)
+        self.ultimate_load = float(self.loads.max()) if len(self.loads) else 0.0
+        self.mechanism = mechanism
+
+    def get_failed_ids(self):
+        '''
+        IDs of the failed members, in order.
+        '''
+        return [self.members[i].get_id() for i in self.failed.tolist()]
+
+    def to_pandas(self):
+        '''
+        DataFrame with one row per step: member (ID), load, failure_load and cascade
+        (True if the member fails without the load going up, because the previous failure overloaded it).
+        '''
+        import pandas as pd
+
+        cascade = np.r_[False, self.loads[1:] <= self.failure_loads[:-1]]
+        return pd.DataFrame({
+            'member': self.get_failed_ids(),
+            'load': self.loads,
+            'failure_load': self.failure_loads,
+            'cascade': cascade,
+        })
+
+
+class DowndatedGram():
+    '''
+    (A A^T)^-1 of an equilibrium matrix that columns are taken out of, one at a time.
+    '''
+    def __init__(self, matrix, factorization=None):
+        lu = getattr(factorization, 'lu', None)
+        if lu is not None:
+            # (A A^T)^-1 v = A^-T (A^-1 v), straight from the LU of a square A
+            self.base = lambda v: lu.solve(lu.solve(v), trans='T')
+        else:
+            gram_lu = spla.splu((matrix @ matrix.T).tocsc())
+            self.base = gram_lu.solve
+        self.Y = np.empty((matrix.shape[0], 0))
+        self.d = np.empty(0)
+
+    def solve(self, rhs):
+        w = self.base(rhs)
+        if len(self.d):
+            w = w + self.Y @ ((self.Y.T @ rhs) / self.d)
+        return w
+
+    def remove(self, column):
+        '''
+        Takes the (dense) column out. Returns False, changing nothing, if that leaves a mechanism.
+        '''
+        y = self.solve(column)
+        d = 1 - column @ y
+        if d <= MECHANISM_TOLERANCE:
+            return False
+        self.Y = np.column_stack([self.Y, y])
+        self.d = np.append(self.d, d)
+        return True
+
+
+def progressive_collapse(bridge, factorization, rhs, max_member_force=500000, max_steps=None):
+    '''
+    CollapseSequence of the bridge, whose equilibrium matrix is factorization, under the load rhs (for a total load of 1).
+    max_steps stops it after that many failures.
+    '''
+    matrix = factorization.matrix.tocsc()
+    num_members = bridge.num_members
+    present = np.ones(matrix.shape[1], dtype=bool)
+    gram = DowndatedGram(matrix, factorization)
+
+    failed = []
+    loads = []
+    mechanism = False
+    while max_steps is None or len(failed) < max_steps:
+        # Minimum norm solution of the current state, with the columns of the failed members zeroed
+        # Forming A A^T squares the condition number, iterative refinement wins the lost digits back
+        x = matrix.T @ gram.solve(rhs) * present
+        for _ in range(REFINE_STEPS):
+            residual = rhs - matrix @ x
+            if np.linalg.norm(residual) <= 1e-10 * np.linalg.norm(rhs):
+                break
+            x = x + matrix.T @ gram.solve(residual) * present
+        if np.linalg.norm(rhs - matrix @ x) > 1e-8 * np.linalg.norm(rhs):
+            mechanism = True  # Lost to rounding before d got small enough to tell
+            break
+
+        forces = np.abs(x[:num_members])
+        member = int(forces.argmax())
+        if forces[member] == 0:
+            break  # Nothing is loaded, which only happens if the load nodes carry it straight to the supports
+        failed.append(member)
+        loads.append(max_member_force / forces[member])
+
+        present[member] = False
+        if not gram.remove(matrix[:, member].toarray().ravel()):
+            mechanism = True
+            break
+        if len(gram.d) >= REFACTOR_RANK:
+            remaining = matrix.copy()
+            remaining.data *= np.repeat(present, np.diff(remaining.indptr))
+            remaining.eliminate_zeros()
+            gram = DowndatedGram(remaining)
+
+    return CollapseSequence(list(bridge.members), failed, loads, mechanism)
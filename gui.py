@@ -10,11 +10,16 @@ from PyQt5.QtWidgets import *
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
+from matplotlib.widgets import RectangleSelector  # To select the nodes in a rectangle
 
-from matplotlib.lines import Line2D  # To detect clicks on nodes
 import matplotlib.pyplot as plt
 
 from bridge import Bridge, Node, Member
+from metrics import SOLVE_PHASES
+from bridge_plot import BridgePlot
+
+
+RESOLVE_DELAY = 30  # ms between the solves requested while a node is dragged
 
 
 class MainWindow(QMainWindow):    
@@ -22,6 +27,12 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.title = 'College of DuPage ENGIN-2201 Bridge Project'
         self.bridge = Bridge()
+        self.thread_pool = QThreadPool.globalInstance()
+        self.solve_job = None  # SolveWorker of the solve that is running
+        self.solve_pending = False  # Whether the bridge changed during that solve and needs solving again when it finishes
+        self.preview = None  # (SolveResult, member nodes) of a solve the drag has since moved on from, for the colours
+        self.dragged_node = None
+        self.drag_version = None  # Bridge version when the drag started, to tell whether it moved anything
         self.InitUI()
 
 
@@ -41,8 +52,9 @@ class MainWindow(QMainWindow):
         self.ax = self.canvas.figure.subplots()
         
         # Initial plot of members and nodes (if they exist)
-        self.plot_bridge()
         self.selected_node = None
+        self.selected_nodes = []  # Nodes selected with the rectangle (right mouse button)
+        self.plot_bridge()
 
         grid.addWidget(self.toolbar, 3, 0)
         grid.addWidget(self.canvas, 0, 0)
@@ -50,8 +62,18 @@ class MainWindow(QMainWindow):
         # Implement Zoom
         self.canvas.mpl_connect('scroll_event', self.zoom)
         
-        # Implement Clicks
-        self.canvas.mpl_connect('pick_event', self.onpick_node)
+        # Implement Clicks. Nodes are found through the bridge's spatial index (see node_index.py)
+        self.canvas.mpl_connect('button_press_event', self.onpick_node)
+        self.canvas.mpl_connect('motion_notify_event', self.on_drag)
+        self.canvas.mpl_connect('button_release_event', self.on_drag_release)
+
+        # While dragging, a solve is requested at most every RESOLVE_DELAY ms (see request_solve)
+        self.resolve_timer = QTimer(self)
+        self.resolve_timer.setSingleShot(True)
+        self.resolve_timer.setInterval(RESOLVE_DELAY)
+        self.resolve_timer.timeout.connect(self.request_solve)
+        self.rectangle_selector = RectangleSelector(self.ax, self.on_rectangle_select, useblit=True, button=[3],
+                                                    minspanx=5, minspany=5, spancoords='pixels')
 
         # BRIDGE MODIFICATION        
         right_subgrid = QGridLayout()
@@ -113,6 +135,10 @@ class MainWindow(QMainWindow):
         supports_hbox.addWidget(self.y_support)
         add_node_vbox.addLayout(supports_hbox)
 
+            # Drag Mode
+        self.drag_mode = QCheckBox('Drag Nodes (re-solves while dragging)')
+        add_node_vbox.addWidget(self.drag_mode)
+
         right_subgrid.addLayout(add_node_vbox, 1, 0)
             
             # Remove Node
@@ -162,6 +188,17 @@ class MainWindow(QMainWindow):
         solve_bridge_button.clicked.connect(self.solve_bridge)
         solution_vbox.addWidget(solve_bridge_button)
 
+        # Progress of a running solve, with a button to cancel it
+        solve_progress_hbox = QHBoxLayout()
+        self.solve_progress = QProgressBar()
+        self.solve_progress.setRange(0, 100)
+        solve_progress_hbox.addWidget(self.solve_progress)
+        self.cancel_solve_button = QPushButton('Cancel')
+        self.cancel_solve_button.clicked.connect(self.cancel_solve)
+        solve_progress_hbox.addWidget(self.cancel_solve_button)
+        solution_vbox.addLayout(solve_progress_hbox)
+        self.show_solve_progress(False)
+
         self.efficiency_text = QLabel()
         self.efficiency_text.setText('Efficiency: None')
         self.efficiency_text.setAlignment(Qt.AlignCenter | Qt.AlignVCenter)
@@ -196,12 +233,10 @@ class MainWindow(QMainWindow):
             self.error_dialog("Cannot add a node with no y-coordinate.")
             return
 
-        node = Node(self.bridge.num_nodes+1, x_coord, y_coord, x_support, y_support)
+        node = Node(self.bridge.next_node_id(), x_coord, y_coord, x_support, y_support)
         self.bridge.add_node(node)
        
-        self.ax.clear()
-        self.plot_bridge()
-        self.canvas.draw()
+        self.redraw_plot(preserve_zoom=False)
 
 
     def remove_node(self):
@@ -210,6 +245,17 @@ class MainWindow(QMainWindow):
         If there is no selected node, it will check the 'Node ID' text box too.
         '''
 
+        # Nodes selected with the rectangle are all removed
+        if len(self.selected_nodes) > 1:
+            if self.bridge.is_solved:
+                self.efficiency_text.setText('Efficiency: None')
+                self.bridge.is_solved = False
+            for node in self.selected_nodes:
+                self.bridge.remove_node(node)
+            self.selected_nodes = []
+            self.redraw_plot(preserve_zoom=False)
+            return
+
         # Check that the remove_node exists
         if self.selected_node == None:
             node = self.bridge.get_node(self.remove_node_id.text())
@@ -224,25 +270,12 @@ class MainWindow(QMainWindow):
             self.efficiency_text.setText('Efficiency: None')
             self.bridge.is_solved = False
 
-        # Remove selected node's members
-            # Filter to find the members that DON'T contain the node we're removing
-            # Then set the bridge's members to that filtered list
-        self.bridge.set_members([member for member in self.bridge.get_members() if member.get_nodeA().get_id() != self.selected_node.get_id() and member.get_nodeB().get_id() != self.selected_node.get_id()])
-        self.bridge.num_members = len(self.bridge.get_members())
-        
-        # Remove displacements
-        if self.selected_node.get_support_x():
-            self.bridge.num_displacements -= 1
-        if self.selected_node.get_support_y():
-            self.bridge.num_displacements -= 1
-
-        # Remove selected node
+        # Remove selected node, along with its members and supports
         self.bridge.remove_node(self.selected_node)
 
         self.selected_node = None
-        self.ax.clear()
-        self.plot_bridge()
-        self.canvas.draw()
+        self.selected_nodes = []
+        self.redraw_plot(preserve_zoom=False)
 
 
     def clear_selection(self):
@@ -250,9 +283,8 @@ class MainWindow(QMainWindow):
         Clears the selected node
         '''
         self.selected_node = None
-        self.ax.clear()
-        self.plot_bridge()
-        self.canvas.draw()
+        self.selected_nodes = []
+        self.redraw_plot(preserve_zoom=False)
 
 
     def add_member(self):
@@ -280,25 +312,25 @@ class MainWindow(QMainWindow):
             self.error_dialog(f"Could not find node {self.node_b.text()} in the bridge.")
             return
 
+        was_solved = self.bridge.is_solved
         if self.bridge.is_solved:
             self.efficiency_text.setText('Efficiency: None')
             self.bridge.is_solved = False
 
         # check if the member already exists
-        for member in self.bridge.get_members():
-            if (member.get_nodeA() == node_a and member.get_nodeB() == node_b) or (member.get_nodeA() == node_b and member.get_nodeB() == node_a):
-                self.error_dialog(f"A member between {node_a.id} and {node_b.id} already exists.")
-                return
+        if self.bridge.get_member(node_a, node_b) is not None:
+            self.error_dialog(f"A member between {node_a.id} and {node_b.id} already exists.")
+            return
 
         # create the member, add it to the bridge
-        member_id = str(len(self.bridge.get_members()) + 1)
+        member_id = self.bridge.next_member_id()
         member = Member(member_id, node_a, node_b)
         self.bridge.add_member(member)
+        if was_solved:
+            self.resolve_after_edit()
 
         # redraw the plot
-        self.ax.clear()
-        self.plot_bridge()
-        self.canvas.draw()
+        self.redraw_plot(preserve_zoom=False)
 
 
     def remove_member(self):
@@ -325,6 +357,7 @@ class MainWindow(QMainWindow):
             self.error_dialog(f"Could not find node {self.node_b.text()} in the bridge.")
             return
 
+        was_solved = self.bridge.is_solved
         if self.bridge.is_solved:
             self.efficiency_text.setText('Efficiency: None')
             self.bridge.is_solved = False
@@ -332,9 +365,9 @@ class MainWindow(QMainWindow):
         try:
             member = self.bridge.get_member(node_a, node_b)
             self.bridge.remove_member(member)
-            self.ax.clear()
-            self.plot_bridge()
-            self.canvas.draw()
+            if was_solved:
+                self.resolve_after_edit()
+            self.redraw_plot(preserve_zoom=False)
         except:  # The member does not exist
             self.error_dialog("The member you are trying to remove doesn't exist.")
             return
@@ -364,10 +397,6 @@ class MainWindow(QMainWindow):
         if self.selected_node is not None:
             current_state = bool(self.selected_node.get_support_x())
             self.selected_node.set_support_x(int(not current_state))
-            if current_state:
-                self.bridge.num_displacements -= 1
-            else:
-                self.bridge.num_displacements += 1
 
 
     def on_y_support_change(self):
@@ -382,12 +411,6 @@ class MainWindow(QMainWindow):
         if self.selected_node is not None:
             current_state = bool(self.selected_node.get_support_y())
             self.selected_node.set_support_y(int(not current_state))  # inverse of the current state
-            
-            if current_state:  # if we're removing a support, decrease the number of displacements
-                self.bridge.num_displacements -= 1
-            
-            else:  # if we're adding a support, increase displacements
-                self.bridge.num_displacements += 1
 
 
     def on_x_coord_change(self):     
@@ -395,6 +418,7 @@ class MainWindow(QMainWindow):
         Captures the 'Enter' keypress in the x-coord box, tries to update the x-coord of the selected node. 
         If there is no selected node, then it tries to make a new node at that coordinate.
         ''' 
+        was_solved = self.bridge.is_solved
         if self.bridge.is_solved:
             self.efficiency_text.setText('Efficiency: None')
             self.bridge.is_solved = False
@@ -404,19 +428,20 @@ class MainWindow(QMainWindow):
             return
 
         if self.selected_node is not None:  # if there is a selected node, update it
-            self.selected_node.set_x(float(self.x_coord.text()))
+            try:
+                self.selected_node.set_x(float(self.x_coord.text()))
+            except ValueError as e:  # Not a number, or onto another node
+                self.error_dialog(str(e))
+                return
+            if was_solved:
+                self.resolve_after_edit()
             
-            self.ax.clear()
-            self.plot_bridge()
-            self.ax.plot(self.selected_node.get_x(), self.selected_node.get_y(), 'go', picker=5)
-            self.canvas.draw()
+            self.redraw_plot(preserve_zoom=False)
 
         else:  # otherwise, make a new one.
-            node = Node(self.bridge.num_nodes+1, float(self.x_coord.text()), float(self.y_coord.text()), self.x_support.isChecked(), self.y_support.isChecked())
+            node = Node(self.bridge.next_node_id(), float(self.x_coord.text()), float(self.y_coord.text()), self.x_support.isChecked(), self.y_support.isChecked())
             self.bridge.add_node(node)
-            self.ax.clear()
-            self.plot_bridge()
-            self.canvas.draw()
+            self.redraw_plot(preserve_zoom=False)
 
 
     def on_y_coord_change(self):
@@ -424,6 +449,7 @@ class MainWindow(QMainWindow):
         Captures the 'Enter' keypress in the y-coord box, tries to update the y-coord of the selected node. 
         If there is no selected node, then it tries to make a new node at that coordinate.
         ''' 
+        was_solved = self.bridge.is_solved
         if self.bridge.is_solved:
             self.efficiency_text.setText('Efficiency: None')
             self.bridge.is_solved = False
@@ -435,161 +461,147 @@ class MainWindow(QMainWindow):
         if self.selected_node is not None:
             try:
                 self.selected_node.set_y(float(self.y_coord.text()))
-            except:
-                pass
+            except ValueError as e:  # Not a number, or onto another node
+                self.error_dialog(str(e))
+                return
+            if was_solved:
+                self.resolve_after_edit()
             
-            self.ax.clear()
-            self.plot_bridge()
-            self.ax.plot(self.selected_node.get_x(), self.selected_node.get_y(), 'go', picker=5)  # Plot the selected node in green
-            self.canvas.draw()
+            self.redraw_plot(preserve_zoom=False)  # Redraws the selected node in green
             
         elif self.selected_node is None:
-            node = Node(self.bridge.num_nodes+1, float(self.x_coord.text()), float(self.y_coord.text()), self.x_support.isChecked(), self.y_support.isChecked())
+            node = Node(self.bridge.next_node_id(), float(self.x_coord.text()), float(self.y_coord.text()), self.x_support.isChecked(), self.y_support.isChecked())
             self.bridge.add_node(node)
-            self.ax.clear()
-            self.plot_bridge()
-            self.canvas.draw()
+            self.redraw_plot(preserve_zoom=False)
 
 
     def onpick_node(self, event):
         '''
-        Captures a 'click' event on a node, marks it as the selected node.
+        Captures a left click on a node, marks it as the selected node.
         '''
-        
-        if isinstance(event.artist, Line2D):
-            self.selected_node = None
-            self.redraw_plot()
+        if event.inaxes is not self.ax or event.button != 1 or self.toolbar.mode != '':
+            return
 
-            thisline = event.artist
-            xdata = thisline.get_xdata()
-            ydata = thisline.get_ydata()
-            ind = event.ind
+        index = self.bridge_plot.node_at(self.bridge.get_node_index(), event.x, event.y)
+        if index < 0:
+            return
+        self.select_node(self.bridge.get_nodes()[index])
+        if self.drag_mode.isChecked():
+            self.dragged_node = self.selected_node
+            self.drag_version = self.bridge.version
 
-            x_coord = str(np.take(xdata, ind)[0])
-            y_coord = str(np.take(ydata, ind)[0])
 
-            for node in self.bridge.get_nodes():
-                if str(node.get_x()) == x_coord and str(node.get_y()) == y_coord:
-                    self.selected_node = node
-            
-            # Get node data
-            selected_x_coord = self.selected_node.get_x()
-            selected_y_coord = self.selected_node.get_y()
-            selected_x_support = self.selected_node.get_support_x()
-            selected_y_support = self.selected_node.get_support_y()
+    def on_drag(self, event):
+        '''
+        Moves the dragged node with the mouse (roadway nodes stay on the roadway) and asks for a re-solve.
+        '''
+        if self.dragged_node is None or event.inaxes is not self.ax or event.xdata is None:
+            return
+        node = self.dragged_node
+        y = 0.0 if node.get_y() == 0 else float(event.ydata)
+        if self.bridge.get_node_at(float(event.xdata), y) is not None:
+            return  # Nodes can't share a position
+        self.bridge.move_node(node, float(event.xdata), y)
 
-            self.ax.plot(selected_x_coord, selected_y_coord, 'go', picker=5)
-            self.canvas.draw()
+        self.x_coord.setText(str(node.get_x()))
+        self.y_coord.setText(str(node.get_y()))
+        self.redraw_plot()
+        if not self.resolve_timer.isActive():
+            self.resolve_timer.start()  # Not restarted by later moves, so the bridge re-solves during the drag
 
-            self.x_coord.setText(str(selected_x_coord))
-            self.y_coord.setText(str(selected_y_coord))
-            self.remove_node_id.setText(str(self.selected_node.get_id()))
 
-            if selected_x_support:
-                self.x_support.setChecked(True)
-            else:
-                self.x_support.setChecked(False)
+    def on_drag_release(self, event):
+        if self.dragged_node is not None:
+            self.dragged_node = None
+            self.resolve_timer.stop()
+            # A click without a move changes nothing, and the last position may already be solved
+            if self.bridge.version != self.drag_version and not self.bridge.is_solved:
+                self.request_solve()
 
-            if selected_y_support:
-                self.y_support.setChecked(True)
-            else:
-                self.y_support.setChecked(False)
 
+    def on_rectangle_select(self, press, release):
+        '''
+        Selects every node inside the rectangle dragged with the right mouse button.
+        '''
+        indices = self.bridge.get_node_index().in_rectangle(press.xdata, press.ydata, release.xdata, release.ydata)
+        nodes = [self.bridge.get_nodes()[i] for i in indices]
+        if len(nodes) == 1:
+            self.select_node(nodes[0])
+            return
+        self.selected_node = None
+        self.selected_nodes = nodes
+        self.remove_node_id.setText('')
+        self.bridge_plot.select(self.bridge, self.selected_nodes)
+
+
+    def select_node(self, node):
+        '''
+        Marks node as the selected node, fills its coordinates and supports into the boxes and highlights it.
+        '''
+        self.selected_node = node
+        self.selected_nodes = [node]
+        self.bridge_plot.select(self.bridge, self.selected_nodes)
+
+        # Get node data
+        selected_x_coord = self.selected_node.get_x()
+        selected_y_coord = self.selected_node.get_y()
+        selected_x_support = self.selected_node.get_support_x()
+        selected_y_support = self.selected_node.get_support_y()
+
+        self.x_coord.setText(str(selected_x_coord))
+        self.y_coord.setText(str(selected_y_coord))
+        self.remove_node_id.setText(str(self.selected_node.get_id()))
+
+        if selected_x_support:
+            self.x_support.setChecked(True)
+        else:
+            self.x_support.setChecked(False)
+
+        if selected_y_support:
+            self.y_support.setChecked(True)
         else:
-            xlim = self.ax.get_xlim()
-            ylim = self.ax.get_ylim()
-            self.ax.clear()
-            self.plot_bridge()
-            self.canvas.draw()
-            self.ax.set_xlim(xlim)
-            self.ax.set_ylim(ylim)
+            self.y_support.setChecked(False)
 
 
     def redraw_plot(self, preserve_zoom=True):
         '''
         Redraws the plot, preserving zoom level.
         '''
-        # Preserve zoom
-        xlim = self.ax.get_xlim()
-        ylim = self.ax.get_ylim()
-        
-        self.ax.clear()
-        self.plot_bridge()
-        self.canvas.draw()
-        
-        if preserve_zoom:
-            self.ax.set_xlim(xlim)
-            self.ax.set_ylim(ylim)
+        self.plot_bridge(preserve_zoom)
+        self.canvas.draw_idle()
 
 
-    def plot_bridge(self):
+    def plot_bridge(self, preserve_zoom=False):
         '''
-        Draws the bridge using matplotlib.
+        Draws the bridge using matplotlib, by updating the artists of a BridgePlot (see bridge_plot.py)
+        instead of clearing the axes and plotting every member and node again.
         '''
+        plot = getattr(self, 'bridge_plot', None)
+        if plot is None or plot.ax is not self.ax:
+            plot = self.bridge_plot = BridgePlot(self.ax)
 
-        if self.bridge.is_solved:
-            seismic = plt.cm.get_cmap('bwr', 2056)
-            # seismic = plt.cm.get_cmap('rainbow', 2056)
-
-            # Plot Members (Blue = Compression, Red = Tension)
-            max_force = self.bridge.internal_forces.abs().max()
+        # While a drag outruns the solver, members are coloured by the last solve if the members are still the same
+        result = None
+        if self.preview is not None and not self.bridge.is_solved:
+            result, member_nodes = self.preview
+            if not np.array_equal(member_nodes, self.bridge.get_member_nodes()):
+                result = self.preview = None
+        plot.update(self.bridge, self._selection(), preserve_zoom, result)
 
-            for member in self.bridge.get_members():   
-                force = self.bridge.internal_forces.loc['F'+str(member.get_id())] 
-                force_remapped = (force + max_force) / (max_force*2+0.000001)
 
-                nodeA = member.get_nodeA()
-                nodeB = member.get_nodeB()
+    def _selection(self):
+        # The node picked by ID in remove_node isn't in selected_nodes
+        node = self.selected_node
+        if node is not None and all(node is not other for other in self.selected_nodes):
+            return self.selected_nodes + [node]
+        return self.selected_nodes
 
-                # Draw a line between the nodes
-                self.ax.plot([nodeA.get_x(),nodeB.get_x()], [nodeA.get_y(),nodeB.get_y()], color=seismic(force_remapped))
-
-            
-            # Plot Loading Nodes (with an Arrow pointing downwards)
-            for node in self.bridge.load_nodes:
-                self.ax.arrow(node.get_x(), node.get_y(), dx=0, dy=-5, length_includes_head=True, head_width=2, head_length=1, width=0.5)
-
-     
-            # Plot Broken Member(s) in Black
-            for member_id, _ in self.bridge.broken_members.items():
-                member = self.bridge.get_member_by_id(member_id[1:])
-                nodeA = member.get_nodeA()
-                nodeB = member.get_nodeB()
-                # Draw a line between the nodes
-                self.ax.plot([nodeA.get_x(),nodeB.get_x()], [nodeA.get_y(),nodeB.get_y()], 'k')
-
-
-            # Plot Zero-Load Member(s) in Green
-            zero_load = self.bridge.internal_forces.where(np.isclose(self.bridge.internal_forces, 0, rtol=1e-03, atol=1e-03, equal_nan=False)).dropna()
-            for member_id, _ in zero_load.items():
-                    member = self.bridge.get_member_by_id(member_id[1:])
-                    nodeA = member.get_nodeA()
-                    nodeB = member.get_nodeB()
-                    # Draw a line between the nodes
-                    self.ax.plot([nodeA.get_x(),nodeB.get_x()], [nodeA.get_y(),nodeB.get_y()], 'g')
-
-
-        else:  # Bridge is not solved, plot normally
-            for member in self.bridge.get_members(): 
-                # Get incident and terminal node
-                nodeA = member.get_nodeA()
-                nodeB = member.get_nodeB()
-                # Draw a line between the nodes
-                self.ax.plot([nodeA.get_x(),nodeB.get_x()], [nodeA.get_y(),nodeB.get_y()], 'ro-')
-        
-
-        # Plot Nodes
-        for node in self.bridge.get_nodes():
-            # Plot node's X and Y coordinate
-            self.ax.plot(node.get_x(), node.get_y(), 'bo', picker=5)
-            # Add a text label with the node's ID
-            self.ax.annotate(node.get_id(), (node.get_x(), node.get_y()), xytext=(node.get_x()+0,node.get_y()+2))
-        
 
     def load_bridge(self):
         options = QFileDialog.Options()
-        fileName, _ = QFileDialog.getOpenFileName(self,"QFileDialog.getOpenFileName()", "","All Files (*);;Text Files (*.txt)", options=options)
+        fileName, _ = QFileDialog.getOpenFileName(self,"QFileDialog.getOpenFileName()", "","All Files (*);;Text Files (*.txt);;Binary Bridge Files (*.brb)", options=options)
         if fileName:
+            self.cancel_solve()
             if self.bridge is not None:
                 self.bridge = Bridge()  
           
@@ -599,47 +611,118 @@ class MainWindow(QMainWindow):
                 return
 
             self.redraw_plot(preserve_zoom=False)
-            self.efficiency_text.setText('Efficiency: None')
+            if self.bridge.is_solved:
+                self.efficiency_text.setText('Efficiency: ' + str(int(self.bridge.efficiency)))
+            else:
+                self.efficiency_text.setText('Efficiency: None')
 
 
     def save_bridge(self):
         '''
-        Writes the current bridge to a user-defined text file.
+        Writes the current bridge to a user-defined text file, or a binary file if its name ends in .brb.
         '''
         options = QFileDialog.Options()
-        fileName, _ = QFileDialog.getSaveFileName(self,"QFileDialog.getOpenFileName()", "","All Files (*);;Text Files (*.txt)", options=options)
-        if fileName:        
+        fileName, _ = QFileDialog.getSaveFileName(self,"QFileDialog.getOpenFileName()", "","All Files (*);;Text Files (*.txt);;Binary Bridge Files (*.brb)", options=options)
+        if fileName.endswith('.brb'):
+            self.bridge.save_binary(fileName)
+        elif fileName:
             self.bridge.save_to_file(fileName)
 
 
     def solve_bridge(self):
-        # For a planar truss to be statically determinate, the number of members plus the number of support reactions must not exceed the number of joints times 2.
-        # members + support_reactions <= joints*2 to be statically determinant
+        # Bridge.solve rejects unstable, disconnected and mechanism trusses with the reason before solving them (see analysis.py)
+        self.start_solve(show_errors=True)
 
-        # support_reaction_count = 0
-        # for node in self.bridge.get_nodes():
-        #     if node.get_support_x():
-        #         support_reaction_count += 1
-        #     if node.get_support_y():
-        #         support_reaction_count += 1
 
-        # lhs = len(self.bridge.get_members()) + support_reaction_count  # left hand side of the equation
-        # rhs = len(self.bridge.get_nodes())*2  # right hand side of the equation
+    def resolve_after_edit(self):
+        '''
+        Re-solves a bridge that was solved before an edit, as an update of the previous factorization.
+        If the edited bridge can't be solved, the efficiency stays at None.
+        '''
+        self.start_solve(show_errors=False)
+
+
+    def start_solve(self, show_errors=True):
+        '''
+        Solves a copy of the bridge on the thread pool, so the window keeps responding while big bridges solve.
+        A solve that is still running is cancelled first.
+        '''
+        if self.solve_job is not None:
+            self.solve_job.cancel()
+
+        job = SolveWorker(self.bridge)
+        job.signals.progress.connect(self.on_solve_progress)
+        job.signals.finished.connect(lambda text: self.on_solve_finished(job, text, show_errors))
+        self.solve_job = job
+
+        self.efficiency_text.setText('Efficiency: Solving...')
+        self.solve_progress.setValue(0)
+        self.show_solve_progress(True)
+        self.thread_pool.start(job)
+
+
+    def request_solve(self):
+        '''
+        Solves the bridge as it is now, unless a solve is already running: then it is solved again when that one
+        finishes, so however many requests come in meanwhile only the latest geometry gets solved.
+        '''
+        if self.solve_job is not None:
+            self.solve_pending = True
+        else:
+            self.start_solve(show_errors=False)
 
-        # if lhs > rhs:
-        #     self.efficiency_text.setText('Efficiency: Not Solvable')
-        #     return
 
-        text = self.bridge.solve()
+    def on_solve_progress(self, percent, phase):
+        self.solve_progress.setValue(percent)
+        self.solve_progress.setFormat(f"{phase} %p%")
+
+
+    def on_solve_finished(self, job, text, show_errors):
+        '''
+        Takes the solution over from a finished SolveWorker, unless the solve was cancelled or the bridge was edited meanwhile.
+        '''
+        if job is not self.solve_job:  # Cancelled or replaced by a newer solve
+            return
+        self.solve_job = None
+        self.show_solve_progress(False)
 
         if text != '':
-            self.error_dialog(text)
+            self.efficiency_text.setText('Efficiency: None')
+            if show_errors:
+                self.error_dialog(text)
+        elif job.source is self.bridge and self.bridge.adopt_solution(job.bridge, job.version):
+            self.preview = None
+            if self.bridge.output is not None:
+                self.bridge.output.write(self.bridge)
+            self.efficiency_text.setText('Efficiency: ' + str(int(self.bridge.efficiency)))
+            self.redraw_plot()
+        elif job.source is self.bridge and self.solve_pending:
+            # Moved on while solving (dragging): show this solve until the one of the latest geometry is done
+            self.preview = (job.bridge.result, job.snapshot['member_nodes'])
+            self.efficiency_text.setText('Efficiency: ' + str(int(job.bridge.efficiency)) + ' (updating)')
+            self.redraw_plot()
+        else:
+            # The solution belongs to the bridge as it was when the solve started
+            self.efficiency_text.setText('Efficiency: None (edited while solving)')
+
+        if self.solve_pending:
+            self.solve_pending = False
+            self.start_solve(show_errors=False)
+
+
+    def cancel_solve(self):
+        if self.solve_job is None:
             return
+        self.solve_job.cancel()
+        self.solve_job = None
+        self.solve_pending = False
+        self.show_solve_progress(False)
+        self.efficiency_text.setText('Efficiency: None')
 
-        self.efficiency_text.setText('Efficiency: ' + str(int(self.bridge.efficiency)))
-        self.redraw_plot()        
-        
-        return
+
+    def show_solve_progress(self, visible):
+        self.solve_progress.setVisible(visible)
+        self.cancel_solve_button.setVisible(visible)
 
 
     def return_to_main(self):
@@ -684,6 +767,50 @@ class MainWindow(QMainWindow):
         self.canvas.draw()
 
 
+class SolveCancelled(Exception):
+    pass
+
+
+class SolveSignals(QObject):
+    progress = pyqtSignal(int, str)  # percent, phase
+    finished = pyqtSignal(str)  # error message, '' on success
+
+
+class SolveWorker(QRunnable):
+    '''
+    Solves a copy of a bridge on a QThreadPool thread, so the bridge can be edited while it solves.
+    Only the bridge's arrays are copied on the GUI thread, the copy is built on the worker thread.
+    The solution stays in the copy (self.bridge) until the GUI takes it over with Bridge.adopt_solution.
+    '''
+    def __init__(self, bridge):
+        super().__init__()
+        self.source = bridge
+        self.version = bridge.version
+        self.snapshot = bridge.snapshot()
+        self.bridge = None
+        self.signals = SolveSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        # Takes effect when the next phase of the solve starts, a factorization that is running can't be interrupted
+        self.cancelled = True
+
+    def on_progress(self, phase):
+        if self.cancelled:
+            raise SolveCancelled()
+        self.signals.progress.emit(100 * SOLVE_PHASES.index(phase) // len(SOLVE_PHASES), phase)
+
+    def run(self):
+        try:
+            self.bridge = Bridge.from_snapshot(self.snapshot)
+            text = self.bridge.solve(incremental=True, progress=self.on_progress)
+        except SolveCancelled:
+            return
+        except Exception as e:
+            text = f"Failed to solve bridge: {e}"
+        self.signals.finished.emit(text)
+
+
 class ConfirmExitDialog(QDialog):
     def __init__(self, parent=None):
         super(ConfirmExitDialog, self).__init__(parent)
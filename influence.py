@@ -0,0 +1,118 @@
+'''
+Influence lines: the force in every member as a load travels along the roadway.
+
+A unit load is put on every roadway node and all of them are solved in one back-substitution against the
+bridge's factorization. Everything else follows from those solutions without solving again, because the
+forces are linear in the loads:
+    between two roadway nodes   the load is split between them by the lever rule, so the influence lines are
+                                piecewise linear and interpolating them is exact (subdivisions only adds samples)
+    axle loads                  a vehicle is the weighted sum of the influence lines at each axle's position;
+                                the vehicle is placed with every axle on every sample point, which finds the
+                                exact envelope when the samples are the roadway nodes
+'''
+import numpy as np
+import scipy.sparse as sp
+
+
+BLOCK_BYTES = 64 * 2**20  # Memory for the right hand sides solved together
+
+
+class InfluenceLines():
+    '''
+    Member forces for every position of the load, in the bridge's member order (forces takes
+    8 bytes per position and member, so long decks with many members are memory hungry):
+        positions               x of the load (of the lead axle for a vehicle), increasing
+        forces                  (len(positions) x num_members) member forces for a unit load or for the vehicle as given
+        max_tension             largest tension of every member over all positions (0 if it is never in tension)
+        max_compression         largest compression of every member, negative (0 if it is never in compression)
+        tension_position        position giving max_tension, per member
+        compression_position    position giving max_compression, per member
+        governing_position      position where the most loaded member is loaded the most
+        governing_member        index of that member
+        max_load                total load (vehicle weight) the bridge carries at the governing position before it fails
+    '''
+    def __init__(self, members, positions, forces, total_weight, max_member_force):
+        self.members = members
+        self.positions = positions
+        self.forces = forces
+
+        self.max_tension = np.maximum(forces.max(axis=0), 0)
+        self.max_compression = np.minimum(forces.min(axis=0), 0)
+        self.tension_position = positions[forces.argmax(axis=0)]
+        self.compression_position = positions[forces.argmin(axis=0)]
+
+        largest = np.abs(forces).max(axis=1)  # most loaded member at each position
+        governing = int(largest.argmax())
+        self.governing_position = float(positions[governing])
+        self.governing_member = int(np.abs(forces[governing]).argmax())
+        self.max_load = max_member_force / largest[governing] * total_weight if largest[governing] > 0 else np.inf
+
+    def to_pandas(self):
+        '''
+        DataFrame of the envelope, one row per member indexed 'F<member id>'.
+        '''
+        import pandas as pd
+
+        return pd.DataFrame({
+            'max_tension': self.max_tension,
+            'tension_position': self.tension_position,
+            'max_compression': self.max_compression,
+            'compression_position': self.compression_position,
+        }, index=['F' + member.get_id() for member in self.members])
+
+
+def deck_weights(deck_x, positions):
+    '''
+    Sparse (len(positions) x len(deck_x)) matrix splitting a unit load at each position between the two
+    roadway nodes around it (deck_x increasing). Rows of positions off the roadway are zero.
+    '''
+    positions = np.asarray(positions, dtype=float)
+    left = np.clip(np.searchsorted(deck_x, positions, side='right') - 1, 0, len(deck_x) - 2)
+    fraction = (positions - deck_x[left]) / (deck_x[left + 1] - deck_x[left])
+    on_deck = (positions >= deck_x[0]) & (positions <= deck_x[-1])
+    rows = np.arange(len(positions))
+    return sp.csr_matrix((np.r_[(1 - fraction) * on_deck, fraction * on_deck], (np.r_[rows, rows], np.r_[left, left + 1])),
+                         shape=(len(positions), len(deck_x)))
+
+
+def influence_lines(bridge, factorization, subdivisions=0, axles=None, max_member_force=500000, check=None):
+    '''
+    InfluenceLines of the bridge, whose equilibrium matrix is factorization.
+    subdivisions adds that many evenly spaced positions between every two roadway nodes.
+    axles is a list of (offset behind the lead axle, weight) for a vehicle, a single unit load by default.
+    check(solution, rhs) is called on every solved block of right hand sides and returns '' or an error
+    message, which is raised as a ValueError.
+    '''
+    coordinates = bridge.get_coordinates()
+    roadway = np.flatnonzero(coordinates[:, 1] == 0)
+    roadway = roadway[np.argsort(coordinates[roadway, 0], kind='stable')]
+    deck_x = coordinates[roadway, 0]
+
+    # One right hand side per roadway node, in the same direction as Bridge.solve's load, solved in blocks
+    # of columns so a long deck doesn't need a dense (2 * nodes x roadway nodes) array at once
+    rows = 2 * bridge.num_nodes
+    block = max(1, BLOCK_BYTES // (8 * rows))
+    node_forces = np.empty((len(roadway), bridge.num_members))  # (roadway nodes x members)
+    for start in range(0, len(roadway), block):
+        columns = roadway[start:start + block]
+        rhs = np.zeros((rows, len(columns)))
+        rhs[2 * columns + 1, np.arange(len(columns))] = 1
+        solution = factorization.solve(rhs)
+        text = check(solution, rhs) if check is not None else ''
+        if text != '':
+            raise ValueError(text)
+        node_forces[start:start + len(columns)] = np.atleast_2d(solution.T)[:, :bridge.num_members]
+
+    fractions = np.arange(subdivisions + 1) / (subdivisions + 1)
+    samples = np.r_[(deck_x[:-1, None] + np.diff(deck_x)[:, None] * fractions).ravel(), deck_x[-1]]
+
+    if axles is None:
+        axles = [(0.0, 1.0)]
+    offsets = np.array([offset for offset, _ in axles], dtype=float)
+    weights = np.array([weight for _, weight in axles], dtype=float)
+
+    # Lead axle positions that put some axle on every sample point
+    positions = np.unique((samples[:, None] + offsets).ravel())
+    weights_matrix = sum(weight * deck_weights(deck_x, positions - offset) for offset, weight in zip(offsets, weights))
+    forces = np.asarray(weights_matrix @ node_forces)
+    return InfluenceLines(list(bridge.members), positions, forces, weights.sum(), max_member_force)
@@ -0,0 +1,152 @@
+'''
+Opt-in instrumentation of Bridge.solve.
+
+Set bridge.collect_metrics = True to keep a SolveReport of every solve in bridge.solve_report,
+or register a hook to receive the report of every solve of every bridge:
+
+    metrics.add_hook(lambda report: statsd.timing('bridge.solve', report.total_wall()))
+
+A report has the wall and CPU (this thread) time of each phase of the solve (validate, check, assemble,
+factorize, solve, postprocess, output) and counters: degrees of freedom, unknowns, nonzeros, the numerical
+rank (from the LU), the kind of factorization used and the critical members. The 1-norm condition number
+costs a few extra solves, so it is only estimated with metrics.options['condition'] = True.
+
+With no hooks and collect_metrics off, solve uses NULL_REPORT, whose methods do nothing.
+
+Bridge.solve(progress=callback) wraps the report in a ProgressReport, which calls callback(phase) as every
+phase starts; the GUI uses it for its progress bar, and cancels a solve by raising from the callback.
+'''
+import time
+
+
+options = {'condition': False}
+_hooks = []
+
+# The phases of Bridge.solve in the order they run ('check' runs again after the factorization)
+SOLVE_PHASES = ('validate', 'check', 'assemble', 'factorize', 'solve', 'postprocess', 'output', 'diagnostics')
+
+
+def add_hook(callback):
+    '''
+    Calls callback(report) after every solve, which also turns instrumentation on for every bridge.
+    '''
+    _hooks.append(callback)
+
+
+def remove_hook(callback):
+    _hooks.remove(callback)
+
+
+class _Phase():
+    __slots__ = ('report', 'name', 'wall', 'cpu')
+
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        # A phase that runs more than once adds up
+        previous = self.report.phases.get(self.name)
+        if previous is not None:
+            wall += previous['wall']
+            cpu += previous['cpu']
+        self.report.phases[self.name] = {'wall': wall, 'cpu': cpu}
+        return False
+
+
+class SolveReport():
+    enabled = True
+
+    def __init__(self, name=''):
+        self.name = name
+        self.phases = {}  # phase -> {'wall': seconds, 'cpu': seconds}
+        self.counters = {}
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count(self, **counters):
+        self.counters.update(counters)
+
+    def total_wall(self):
+        return sum(phase['wall'] for phase in self.phases.values())
+
+    def total_cpu(self):
+        return sum(phase['cpu'] for phase in self.phases.values())
+
+    def as_dict(self):
+        return {'name': self.name, 'phases': self.phases, 'counters': self.counters}
+
+    def __str__(self):
+        lines = [f"Solve report for {self.name}"]
+        lines += [f"  {name:<12} wall {phase['wall'] * 1000:9.3f} ms  cpu {phase['cpu'] * 1000:9.3f} ms" for name, phase in self.phases.items()]
+        lines += [f"  {name}: {value}" for name, value in self.counters.items()]
+        return '\n'.join(lines)
+
+
+class _NullPhase():
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullReport():
+    '''
+    Stand-in for SolveReport when instrumentation is off.
+    '''
+    enabled = False
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        return self._phase
+
+    def count(self, **counters):
+        pass
+
+
+NULL_REPORT = NullReport()
+
+
+class ProgressReport():
+    '''
+    Passes the phases and counters of a solve on to report, calling progress(phase) as each phase starts.
+    '''
+    def __init__(self, report, progress):
+        self.report = report
+        self.progress = progress
+        self.enabled = report.enabled
+
+    def phase(self, name):
+        self.progress(name)
+        return self.report.phase(name)
+
+    def count(self, **counters):
+        self.report.count(**counters)
+
+
+def start_report(bridge, progress=None):
+    report = SolveReport(bridge.name) if bridge.collect_metrics or _hooks else NULL_REPORT
+    if progress is not None:
+        report = ProgressReport(report, progress)
+    return report
+
+
+def finish_report(bridge, report):
+    if not report.enabled:
+        return
+    if isinstance(report, ProgressReport):
+        report = report.report
+    bridge.solve_report = report
+    for hook in list(_hooks):
+        hook(report)
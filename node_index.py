@@ -0,0 +1,41 @@
+'''
+Spatial index over the node positions of a bridge, so finding the node under the mouse or the nodes inside
+a rectangle doesn't look at every node. It is a KD-tree (scipy.spatial.cKDTree) that Bridge.get_node_index
+rebuilds when nodes are added, moved or removed.
+'''
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class NodeIndex():
+    def __init__(self, coordinates, version=-1):
+        self.coordinates = np.array(coordinates, dtype=float)  # A copy, the bridge's array changes in place
+        self.version = version
+        self.tree = cKDTree(self.coordinates) if len(self.coordinates) else None
+
+    def within(self, x, y, dx, dy):
+        '''
+        Indices of the nodes with |node x - x| <= dx and |node y - y| <= dy, sorted.
+        '''
+        if self.tree is None:
+            return np.empty(0, dtype=np.intp)
+        # The tree answers squares (the infinity norm), the rectangle is cut out of the square around it
+        candidates = np.array(self.tree.query_ball_point((x, y), max(dx, dy), p=np.inf), dtype=np.intp)
+        points = self.coordinates[candidates]
+        inside = (np.abs(points[:, 0] - x) <= dx) & (np.abs(points[:, 1] - y) <= dy)
+        return np.sort(candidates[inside])
+
+    def in_rectangle(self, x0, y0, x1, y1):
+        '''
+        Indices of the nodes inside the rectangle with corners (x0, y0) and (x1, y1), sorted.
+        '''
+        return self.within((x0 + x1) / 2, (y0 + y1) / 2, abs(x1 - x0) / 2, abs(y1 - y0) / 2)
+
+    def nearest(self, x, y, max_distance=np.inf):
+        '''
+        Index of the node closest to (x, y), or -1 if none is within max_distance.
+        '''
+        if self.tree is None:
+            return -1
+        distance, index = self.tree.query((x, y), distance_upper_bound=max_distance)
+        return int(index) if np.isfinite(distance) else -1
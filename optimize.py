@@ -0,0 +1,209 @@
+'''
+Evolutionary search for more efficient bridge designs.
+
+Starting from a saved bridge, every generation mutates the best designs found so far
+(node positions and which members are present) and evaluates the children on a process pool.
+Supported nodes never move and roadway nodes (y = 0) only slide along the roadway.
+
+    python optimize.py my_bridge.txt -o best_bridge.txt --generations 100 --population 64
+'''
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bridge import Bridge, MAX_MEMBER_FORCE
+from solver import load_vector
+
+
+STEP_FRACTION = 0.25  # Default step as a fraction of the median member length
+STEP_SHRINK = 0.7
+MAX_REJECTION_RATE = 0.5  # Share of invalid node-move children above which the step shrinks
+MIN_REJECTION_RATE = 0.1  # and below which it grows back
+
+
+class DesignSpace():
+    '''
+    Everything about the starting bridge that the optimizer keeps fixed: node IDs, supports,
+    which nodes may move in which direction, and the pool of members it may switch on and off.
+    '''
+    def __init__(self, bridge, extra_member_radius=1.0, snap=1.0):
+        self.node_ids = [node.get_id() for node in bridge.get_nodes()]
+        self.coordinates = bridge.get_coordinates().copy()
+        self.supports = bridge.get_supports().copy()
+        self.snap = snap
+
+        # Supported nodes are fixed, roadway nodes may only move along x
+        fixed = self.supports.any(axis=1)
+        roadway = self.coordinates[:, 1] == 0
+        self.movable = np.column_stack([~fixed, ~fixed & ~roadway])
+
+        # Member pool: the original members, plus every unconnected pair of nodes no further apart than
+        # extra_member_radius times the longest original member
+        member_nodes = bridge.get_member_nodes()
+        pool = set(map(tuple, np.sort(member_nodes, axis=1)))
+        longest = bridge.get_member_lengths().max() if len(member_nodes) else 0
+        if extra_member_radius > 0 and len(self.coordinates) <= 500:
+            delta = self.coordinates[:, None, :] - self.coordinates[None, :, :]
+            distance = np.hypot(delta[..., 0], delta[..., 1])
+            a, b = np.nonzero(np.triu(distance <= extra_member_radius * longest, k=1))
+            pool.update(zip(a.tolist(), b.tolist()))
+
+        original = set(map(tuple, np.sort(member_nodes, axis=1)))
+        self.member_pool = np.array(sorted(pool), dtype=np.intp).reshape(-1, 2)
+        self.initial_members = np.array([tuple(pair) in original for pair in self.member_pool])
+
+        self.span = np.ptp(self.coordinates[:, 0]) if len(self.coordinates) else 1.0
+        self.typical_length = float(np.median(bridge.get_member_lengths())) if len(member_nodes) else self.span
+
+    def build(self, coordinates, members):
+        '''
+        Bridge for one design: node coordinates plus a boolean mask over the member pool.
+        '''
+        return Bridge.from_arrays(coordinates, self.supports, self.member_pool[members], node_ids=self.node_ids)
+
+    def mutate(self, rng, coordinates, members, step, member_rate):
+        coordinates = coordinates + rng.normal(0, step, coordinates.shape) * self.movable
+        if self.snap:
+            coordinates = np.where(self.movable, np.round(coordinates / self.snap) * self.snap, coordinates)
+
+        members = members.copy()
+        flip = rng.random(len(members)) < member_rate
+        members[flip] = ~members[flip]
+        return coordinates, members
+
+
+def evaluate_design(space, coordinates, members):
+    '''
+    Efficiency (max load / total member length) of one design, 0 if it can't be solved
+    (failed validation, a mechanism, or nodes on top of each other).
+    '''
+    if not members.any() or len(np.unique(coordinates, axis=0)) != len(coordinates):
+        return 0.0
+
+    bridge = space.build(coordinates, members)
+    if bridge.validate() != '' or bridge.check() != '':
+        return 0.0  # Including the unstable and disconnected designs, rejected before anything is factorized
+
+    with np.errstate(all='ignore'):
+        lengths = bridge.get_member_lengths()
+        if not np.all(lengths > 0):
+            return 0.0
+
+        factorization, _ = bridge.get_factorization()
+        if factorization.singular:
+            return 0.0  # The truss is a mechanism
+
+        rhs = load_vector(bridge, bridge.load_nodes, 1)
+        result = factorization.solve(rhs)
+        if bridge._check_residual(factorization, result, rhs) != '':
+            return 0.0  # Doesn't balance the load, the same test Bridge.solve rejects it by
+
+        max_force = np.abs(result[:bridge.num_members]).max()
+        if max_force == 0:
+            return 0.0
+        return float(MAX_MEMBER_FORCE / max_force / lengths.sum())
+
+
+_worker_space = None
+
+
+def _init_worker(space):
+    global _worker_space
+    _worker_space = space
+
+
+def _evaluate(design):
+    return evaluate_design(_worker_space, *design)
+
+
+def optimize(bridge, generations=50, population=32, children=None, step=None, member_rate=None,
+             workers=None, seed=None, extra_member_radius=1.0, snap=1.0, callback=None):
+    '''
+    Runs a (population + children) evolution strategy starting from bridge.
+    step is the starting standard deviation of node moves (default a quarter of the median member length),
+    member_rate the chance of switching each pool member on or off (default about one flip per child).
+    After every generation the step shrinks if most children that only moved nodes were invalid, and grows
+    back if hardly any were.
+    callback(generation, best_efficiency) is called after every generation.
+
+    Returns (best_bridge, best_efficiency).
+    '''
+    space = DesignSpace(bridge, extra_member_radius, snap)
+    rng = np.random.default_rng(seed)
+    children = children or 2 * population
+    step = step if step is not None else STEP_FRACTION * space.typical_length
+    member_rate = member_rate if member_rate is not None else 1.0 / max(1, len(space.member_pool))
+
+    parents = [(space.coordinates, space.initial_members)]
+    fitness = [evaluate_design(space, *parents[0])]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(space,)) as pool:
+        for generation in range(generations):
+            offspring = []
+            moved_only = []
+            for _ in range(children):
+                coordinates, members = parents[rng.integers(len(parents))]
+                offspring.append(space.mutate(rng, coordinates, members, step, member_rate))
+                moved_only.append(np.array_equal(offspring[-1][1], members))
+
+            chunksize = max(1, children // (4 * (workers or 4)))
+            offspring_fitness = list(pool.map(_evaluate, offspring, chunksize=chunksize))
+
+            # Adapt the step to how often node moves break the design (tangled or coincident nodes, a
+            # support overtaken). Member flips are left out: switching off a member of a determinate
+            # truss always leaves a mechanism, whatever the step.
+            invalid = [score == 0 for score, moved in zip(offspring_fitness, moved_only) if moved]
+            if invalid:
+                rejection_rate = np.mean(invalid)
+                if rejection_rate > MAX_REJECTION_RATE:
+                    step = max(step * STEP_SHRINK, space.snap / 2)
+                elif rejection_rate < MIN_REJECTION_RATE:
+                    step = min(step / STEP_SHRINK, space.typical_length)
+
+            # Keep the best of parents and children
+            candidates = parents + offspring
+            scores = np.array(fitness + offspring_fitness)
+            best = np.argsort(-scores, kind='stable')[:population]
+            parents = [candidates[i] for i in best]
+            fitness = [float(scores[i]) for i in best]
+
+            if callback is not None:
+                callback(generation, fitness[0])
+
+    return space.build(*parents[0]), fitness[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search for a more efficient version of a bridge.')
+    parser.add_argument('bridge', help='bridge .txt file to start from')
+    parser.add_argument('-o', '--output', help='where to save the best bridge found')
+    parser.add_argument('-g', '--generations', type=int, default=50)
+    parser.add_argument('-p', '--population', type=int, default=32)
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--step', type=float, default=None, help='starting standard deviation of node moves (default: a quarter of the median member length)')
+    parser.add_argument('--snap', type=float, default=1.0, help='round moved coordinates to this grid, 0 to disable (default: 1)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    bridge = Bridge()
+    text = bridge.load_from_file(args.bridge)
+    if text != '':
+        print(text, file=sys.stderr)
+        return 1
+
+    def report(generation, efficiency):
+        print(f"Generation {generation + 1}: best efficiency {efficiency:.2f}")
+
+    best, efficiency = optimize(bridge, args.generations, args.population, step=args.step,
+                                workers=args.workers, seed=args.seed, snap=args.snap, callback=report)
+    print(f"Best efficiency found: {efficiency:.2f}")
+
+    if args.output:
+        best.save_to_file(args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+'''
+Writing solved bridges to disk, as a separate stage from solving them.
+
+A ResultWriter has a destination (a path, or an open file for the text formats) and a format:
+    text    the output.txt format: max load, external forces and internal forces
+    csv     one row per member: member, node_a, node_b, force
+    jsonl   one JSON object per solve, with the load, efficiency, critical members and forces
+    binary  the .brb format of bridge_binary.py, the whole bridge plus its forces
+
+Each write formats the whole result into one buffer and writes it with a single call. With background=True
+(the default) the write runs on a shared writer thread, so Bridge.solve only pays for copying the results.
+Call flush() before reading the file back.
+'''
+import atexit
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from bridge_binary import write_binary
+
+
+FORMATS = ('text', 'csv', 'jsonl', 'binary')
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.brb': 'binary'}
+
+
+class ResultSnapshot():
+    '''
+    Copy of everything a ResultWriter needs from a solved bridge, so the bridge can change
+    while the write is still waiting for the writer thread.
+    '''
+    def __init__(self, bridge):
+        self.name = bridge.name
+        self.load = float(bridge.load)
+        self.efficiency = float(bridge.efficiency)
+        self.total_length = bridge.get_total_length()
+        self.node_ids = [node.get_id() for node in bridge.nodes]
+        self.member_ids = [member.get_id() for member in bridge.members]
+        self.coordinates = bridge.get_coordinates().copy()
+        self.supports = bridge.get_supports().copy()
+        self.member_nodes = bridge.get_member_nodes().copy()
+        self.forces = np.array(bridge.get_member_forces(), dtype=float)
+        self.critical_members = [self.member_ids[i] for i in bridge.get_critical_members()]
+
+        self.load_nodes = np.zeros(len(self.node_ids), dtype=bool)
+        self.load_nodes[[node.index for node in bridge.load_nodes]] = True
+
+
+def format_text(snapshot):
+    load_per_node = str(snapshot.load / snapshot.load_nodes.sum())
+    lines = ['Maximum Total Load of Bridge', str(snapshot.load), '', 'External Forces', 'node#\tXreaction\tYreaction']
+    lines += [node_id + '\t0\t' + (load_per_node if loaded else '0') for node_id, loaded in zip(snapshot.node_ids, snapshot.load_nodes.tolist())]
+    lines += ['', 'Internal Forces']
+    lines += ['F' + member_id + '\t' + repr(force) for member_id, force in zip(snapshot.member_ids, snapshot.forces.tolist())]
+    return '\n'.join(lines) + '\n'
+
+
+def format_csv(snapshot):
+    lines = ['member,node_a,node_b,force']
+    node_ids = snapshot.node_ids
+    lines += [f"{member_id},{node_ids[a]},{node_ids[b]},{force!r}"
+              for member_id, (a, b), force in zip(snapshot.member_ids, snapshot.member_nodes.tolist(), snapshot.forces.tolist())]
+    return '\n'.join(lines) + '\n'
+
+
+def format_jsonl(snapshot):
+    return json.dumps({
+        'name': snapshot.name,
+        'max_load': snapshot.load,
+        'efficiency': snapshot.efficiency,
+        'total_length': snapshot.total_length,
+        'critical_members': snapshot.critical_members,
+        'forces': dict(zip(snapshot.member_ids, snapshot.forces.tolist())),
+    }) + '\n'
+
+
+FORMATTERS = {'text': format_text, 'csv': format_csv, 'jsonl': format_jsonl}
+
+
+class ResultWriter():
+    '''
+    Writes the results of Bridge.solve. format defaults to the destination's extension
+    (.csv, .jsonl, .brb), otherwise text. With append=True every solve is added to the
+    destination instead of replacing it (not available for binary).
+    '''
+    def __init__(self, destination='./output.txt', format=None, background=True, append=False):
+        if format is None:
+            format = EXTENSIONS.get(os.path.splitext(str(destination))[1].lower(), 'text') if isinstance(destination, (str, os.PathLike)) else 'text'
+        if format not in FORMATS:
+            raise ValueError(f"Unknown output format '{format}', expected one of {', '.join(FORMATS)}.")
+        if format == 'binary' and (append or not isinstance(destination, (str, os.PathLike))):
+            raise ValueError('Binary output needs a file name and cannot be appended to.')
+
+        self.destination = destination
+        self.format = format
+        self.background = background
+        self.append = append
+        self.errors = []  # Exceptions raised by background writes, re-raised by flush
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._queued = False
+
+    def write(self, bridge):
+        snapshot = ResultSnapshot(bridge)
+        if not self.background:
+            self._write_now([snapshot])
+            return
+
+        with self._lock:
+            if self.append:
+                self._pending.append(snapshot)
+            else:
+                self._pending = [snapshot]  # Only the latest result survives an overwrite anyway
+            queued = self._queued
+            self._queued = True
+        if not queued:
+            _writer_queue().put(self)
+
+    def flush(self):
+        '''
+        Waits for every queued background write, then raises the first error any of them hit.
+        '''
+        if _queue is not None:
+            _queue.join()
+        if self.errors:
+            error = self.errors[0]
+            self.errors = []
+            raise error
+
+    def _take_pending(self):
+        with self._lock:
+            snapshots = self._pending
+            self._pending = []
+            self._queued = False
+        return snapshots
+
+    def _write_now(self, snapshots):
+        if not snapshots:
+            return
+        if self.format == 'binary':
+            snapshot = snapshots[-1]
+            write_binary(self.destination, snapshot.coordinates, snapshot.supports, snapshot.member_nodes,
+                         snapshot.node_ids, snapshot.member_ids, snapshot.forces, snapshot.load)
+            return
+
+        formatter = FORMATTERS[self.format]
+        if self.format == 'csv' and self.append:
+            # One header for the whole file
+            buffer = ''.join(formatter(snapshot).split('\n', 1)[1] for snapshot in snapshots)
+            if not _has_content(self.destination):
+                buffer = 'member,node_a,node_b,force\n' + buffer
+        else:
+            buffer = ''.join(formatter(snapshot) for snapshot in snapshots)
+
+        if not isinstance(self.destination, (str, os.PathLike)):
+            self.destination.write(buffer)
+            self.destination.flush()
+            return
+        with open(self.destination, 'a' if self.append else 'w') as file:
+            file.write(buffer)
+
+
+def _has_content(destination):
+    if isinstance(destination, (str, os.PathLike)):
+        return os.path.exists(destination) and os.path.getsize(destination) > 0
+    return True
+
+
+# One writer thread shared by every ResultWriter, started on the first background write
+_queue = None
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _writer_queue():
+    global _queue, _thread
+    with _thread_lock:
+        if _thread is None:
+            _queue = queue.Queue()
+            _thread = threading.Thread(target=_run_writer, args=(_queue,), name='bridge-output', daemon=True)
+            _thread.start()
+            atexit.register(_queue.join)  # Finish pending writes before the interpreter exits
+    return _queue
+
+
+def _run_writer(jobs):
+    while True:
+        writer = jobs.get()
+        try:
+            writer._write_now(writer._take_pending())
+        except Exception as e:
+            writer.errors.append(e)
+        finally:
+            jobs.task_done()
+
+
+def _reset_after_fork():
+    # A forked child (e.g. a ProcessPoolExecutor worker) doesn't inherit the writer thread
+    global _queue, _thread, _thread_lock
+    _queue = None
+    _thread = None
+    _thread_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
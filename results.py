@@ -0,0 +1,106 @@
+'''
+Results of Bridge.solve as plain NumPy arrays.
+'''
+import numpy as np
+
+
+TENSION = 1
+COMPRESSION = -1
+ZERO = 0
+STATE_NAMES = {TENSION: 'tension', COMPRESSION: 'compression', ZERO: 'zero'}
+
+ZERO_FORCE = 1e-3  # Members carrying less than this at the max load count as zero-force members
+
+
+class SolveResult():
+    '''
+    Solution of one solve, with every member array in the bridge's member order at the time of the solve:
+        forces          member forces at the max load (positive is tension, negative compression)
+        unit_forces     member forces under the load that was solved for
+        state           TENSION, COMPRESSION or ZERO for every member
+        critical        indices of the members that fail first (within 0.1% of the largest force)
+        reactions       (num_nodes x 2) support reactions at the max load, 0 where a node isn't supported,
+                        None for results restored from a file
+        supports        (num_nodes x 2) bool, the supported directions of every node
+        displacements   (num_nodes x 2) node displacements at the max load, None unless the stiffness method solved it
+        max_load, efficiency, total_length
+    '''
+    def __init__(self, members, nodes, supports, unit_forces, critical, max_load, total_length, unit_reactions=None,
+                 unit_displacements=None):
+        self.members = members
+        self.nodes = nodes
+        self.supports = supports
+        self.unit_forces = unit_forces
+        self.critical = critical
+        self.max_load = max_load
+        self.total_length = total_length
+        self.efficiency = max_load / total_length
+        self.forces = unit_forces * max_load
+        self.unit_reactions = unit_reactions
+        self.reactions = None if unit_reactions is None else unit_reactions * max_load
+        self.unit_displacements = unit_displacements
+        self.displacements = None if unit_displacements is None else unit_displacements * max_load
+
+        self.state = np.sign(self.forces).astype(np.int8)
+        self.state[np.abs(self.forces) <= ZERO_FORCE] = ZERO
+
+    @property
+    def tension(self):
+        return self.state == TENSION
+
+    @property
+    def compression(self):
+        return self.state == COMPRESSION
+
+    @property
+    def zero(self):
+        return self.state == ZERO
+
+    @property
+    def member_ids(self):
+        return [member.get_id() for member in self.members]
+
+    @property
+    def node_ids(self):
+        return [node.get_id() for node in self.nodes]
+
+    def get_critical_ids(self):
+        return [self.members[i].get_id() for i in self.critical]
+
+    def to_pandas(self):
+        '''
+        DataFrame with one row per member (indexed 'F<member id>' like the equilibrium matrix columns):
+        force, unit_force, state ('tension', 'compression' or 'zero') and critical.
+        '''
+        import pandas as pd
+
+        critical = np.zeros(len(self.members), dtype=bool)
+        critical[self.critical] = True
+        return pd.DataFrame({
+            'force': self.forces,
+            'unit_force': self.unit_forces,
+            'state': [STATE_NAMES[state] for state in self.state.tolist()],
+            'critical': critical,
+        }, index=['F' + member_id for member_id in self.member_ids])
+
+    def reactions_to_pandas(self):
+        '''
+        DataFrame of the x and y reactions of every supported node, indexed by node ID.
+        '''
+        import pandas as pd
+
+        if self.reactions is None:
+            return None
+        supported = np.flatnonzero(self.supports.any(axis=1))
+        node_ids = self.node_ids
+        return pd.DataFrame(self.reactions[supported], columns=['x', 'y'], index=[node_ids[i] for i in supported])
+
+    def displacements_to_pandas(self):
+        '''
+        DataFrame of the x and y displacements of every node, indexed by node ID (None without displacements).
+        '''
+        import pandas as pd
+
+        if self.displacements is None:
+            return None
+        return pd.DataFrame(self.displacements, columns=['x', 'y'], index=self.node_ids)
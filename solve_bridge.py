@@ -0,0 +1,95 @@
+'''
+Solves one bridge file from the command line, without the GUI.
+
+    python solve_bridge.py my_bridge.txt
+    python solve_bridge.py my_bridge.brb --json -o results.jsonl
+
+Only the solver's own dependencies (NumPy and scipy.sparse) are imported; pandas, matplotlib and Qt never are,
+so a one-shot solve starts in a fraction of a second. --timing prints how long the imports, loading and solving took.
+'''
+import time
+
+_start = time.perf_counter()
+
+import argparse
+import json
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a bridge file and print its max load, efficiency and critical members.')
+    parser.add_argument('bridge', help='bridge .txt or .brb file')
+    parser.add_argument('-o', '--output', help='also write the full results here (format from the extension: .txt, .csv, .jsonl, .brb)')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    parser.add_argument('--timing', action='store_true', help='print import, load and solve times to stderr')
+    parser.add_argument('--method', choices=('equilibrium', 'stiffness'), default='equilibrium',
+                        help='solve for the forces directly, or with the direct stiffness method, which also gives '
+                             'the displacements (see stiffness.py)')
+    parser.add_argument('--influence', type=int, nargs='?', const=0, metavar='SUBDIVISIONS',
+                        help='also move a point load along the roadway and report where it governs (see influence.py)')
+    parser.add_argument('--collapse', action='store_true',
+                        help='also take failed members out one by one until the truss collapses (see collapse.py)')
+    args = parser.parse_args(argv)
+
+    # Imported here so --help doesn't pay for NumPy and SciPy
+    from bridge import Bridge
+    from output import ResultWriter
+    imported = time.perf_counter()
+
+    bridge = Bridge()
+    bridge.output = None
+    bridge.method = args.method
+    text = bridge.load_from_file(args.bridge)
+    loaded = time.perf_counter()
+    if text == '':
+        text = bridge.solve()
+    solved = time.perf_counter()
+
+    if text != '':
+        print(text, file=sys.stderr)
+        return 1
+
+    if args.output:
+        ResultWriter(args.output, background=False).write(bridge)
+
+    result = bridge.get_result()
+    critical = result.get_critical_ids()
+    max_displacement = None
+    if result.displacements is not None:
+        max_displacement = float(abs(result.displacements).max())
+    lines = None if args.influence is None else bridge.get_influence_lines(args.influence)
+    sequence = bridge.get_progressive_collapse() if args.collapse else None
+    if args.json:
+        print(json.dumps({'max_load': result.max_load, 'efficiency': result.efficiency,
+                          'total_length': result.total_length, 'critical_members': critical,
+                          'tension': int(result.tension.sum()), 'compression': int(result.compression.sum()),
+                          'zero_force': int(result.zero.sum()),
+                          **({} if max_displacement is None else {'max_displacement': max_displacement}),
+                          **({} if lines is None else {'point_load': {
+                              'max_load': lines.max_load, 'position': lines.governing_position,
+                              'member': bridge.members[lines.governing_member].get_id()}}),
+                          **({} if sequence is None else {'collapse': {
+                              'members': sequence.get_failed_ids(), 'failure_loads': sequence.failure_loads.tolist(),
+                              'ultimate_load': sequence.ultimate_load}})}))
+    else:
+        print(f"Max load: {result.max_load}")
+        print(f"Efficiency: {result.efficiency}")
+        print(f"Critical members: {' '.join(critical)}")
+        print(f"Tension / compression / zero-force members: {result.tension.sum()} / {result.compression.sum()} / {result.zero.sum()}")
+        if max_displacement is not None:
+            print(f"Max displacement at the max load: {max_displacement}")
+        if lines is not None:
+            print(f"Max moving point load: {lines.max_load} at x = {lines.governing_position} "
+                  f"(member {bridge.members[lines.governing_member].get_id()})")
+        if sequence is not None:
+            steps = ', '.join(f"{member} at {load:g}" for member, load in zip(sequence.get_failed_ids(), sequence.failure_loads))
+            print(f"Collapse sequence: {steps}")
+            print(f"Ultimate load: {sequence.ultimate_load}")
+
+    if args.timing:
+        print(f"imports {imported - _start:.3f} s, load {loaded - imported:.3f} s, solve {solved - loaded:.3f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
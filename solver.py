@@ -0,0 +1,257 @@
+'''
+Sparse assembly and solution of the truss equilibrium equations.
+
+Every node contributes two rows (x and y), every member one column and every support one reaction column.
+A member only touches the four rows of its two end nodes and a reaction only touches one row,
+so the matrix is built directly in COO form and converted to CSC for the factorization.
+'''
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+
+RESIDUAL_TOLERANCE = 1e-6  # Largest out of balance load, relative to the load, of an accepted solution
+MIN_UPDATE_COLUMNS = 2000  # Below this a full LU is as quick as a low-rank update of the last one
+
+
+def assemble_equilibrium(bridge):
+    '''
+    Builds the equilibrium matrix of the bridge.
+    Returns the matrix (CSC) and the column labels ('F<member id>' followed by 'R<node id>x' / 'R<node id>y').
+    '''
+    member_nodes = bridge.get_member_nodes()
+    supports = bridge.get_supports().ravel()  # node i, direction k is row 2*i + k
+    num_members = len(member_nodes)
+    cos, sin = bridge.get_direction_cosines()
+
+    # Member columns: (cos, sin) on node A's rows, (-cos, -sin) on node B's rows
+    a_row = 2 * member_nodes[:, 0]
+    b_row = 2 * member_nodes[:, 1]
+    member_rows = np.column_stack([a_row, a_row + 1, b_row, b_row + 1]).ravel()
+    member_cols = np.repeat(np.arange(num_members), 4)
+    member_vals = np.column_stack([cos, sin, -cos, -sin]).ravel()
+
+    # Support reactions, one column per supported direction
+    reaction_rows = np.flatnonzero(supports)
+    reaction_cols = num_members + np.arange(len(reaction_rows))
+
+    rows = np.concatenate([member_rows, reaction_rows])
+    cols = np.concatenate([member_cols, reaction_cols])
+    vals = np.concatenate([member_vals, np.ones(len(reaction_rows))])
+
+    shape = (len(supports), num_members + len(reaction_rows))
+    matrix = sp.coo_matrix((vals, (rows, cols)), shape=shape).tocsc()  # duplicate entries are summed
+
+    columns = ['F' + member.get_id() for member in bridge.get_members()]
+    for row in reaction_rows:
+        columns.append('R' + bridge.get_nodes()[row // 2].get_id() + 'xy'[row % 2])
+    return matrix, columns
+
+
+def load_vector(bridge, load_nodes, load):
+    '''
+    Right hand side of the equilibrium equations: the total load split evenly over the y rows of the load nodes.
+    '''
+    rhs = np.zeros(2 * bridge.num_nodes)
+    rhs[[2 * node.index + 1 for node in load_nodes]] = load / len(load_nodes)
+    return rhs
+
+
+class Factorization():
+    '''
+    Factorized equilibrium matrix that can be reused for any number of right hand sides.
+    A statically determinate truss gives a square matrix, which is factorized with a sparse LU.
+    A statically indeterminate one (more unknowns than equations) gets the minimum norm solution, the same one
+    np.linalg.lstsq gives, from a sparse LU of the augmented system
+        [ I  A^T ] [ x ]   [ 0 ]
+        [ A   0  ] [ y ] = [ b ]
+    which says x = -A^T y with A x = b. Unlike the normal equations A A^T it doesn't square the condition number,
+    and it is singular exactly when A loses rank, i.e. when the truss is a mechanism.
+    singular is True if the matrix (or the augmented system) couldn't be factorized.
+    '''
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.lu = None
+        self.augmented = None
+        self.augmented_lu = None
+
+        if matrix.shape[0] == matrix.shape[1]:
+            try:
+                self.lu = spla.splu(matrix)
+            except RuntimeError:  # Factor is exactly singular
+                pass
+        else:
+            self.augmented = sp.bmat([[sp.identity(matrix.shape[1]), matrix.T], [matrix, None]], format='csc')
+            try:
+                self.augmented_lu = spla.splu(self.augmented)
+            except RuntimeError:
+                pass
+        self.singular = self.lu is None and self.augmented_lu is None
+
+    def solve(self, rhs):
+        '''
+        Solves matrix @ x = rhs. rhs is either one vector or a (rows x k) array of k right hand sides,
+        which are back-substituted together.
+        '''
+        rhs = np.asarray(rhs, dtype=float)
+        if self.lu is not None:
+            return self.lu.solve(rhs)
+
+        num_columns = self.matrix.shape[1]
+        x = self._augmented_solve(np.concatenate([np.zeros((num_columns,) + rhs.shape[1:]), rhs]))
+        return x[:num_columns]
+
+    def solve_transpose(self, rhs):
+        '''
+        Solves matrix^T @ x = rhs (the adjoint system) with the same factorization, in the least squares sense
+        for a non-square matrix.
+        '''
+        rhs = np.asarray(rhs, dtype=float)
+        if self.lu is not None:
+            return self.lu.solve(rhs, trans='T')
+
+        # [I A^T; A 0] [s; y] = [rhs; 0] gives A (rhs - A^T y) = 0, the normal equations of min |A^T y - rhs|
+        num_columns = self.matrix.shape[1]
+        y = self._augmented_solve(np.concatenate([rhs, np.zeros((self.matrix.shape[0],) + rhs.shape[1:])]))
+        return y[num_columns:]
+
+    def _augmented_solve(self, rhs):
+        solution = self.augmented_lu.solve(rhs)
+        # One step of iterative refinement, the augmented system is less well scaled than A itself
+        return solution + self.augmented_lu.solve(rhs - self.augmented @ solution)
+
+
+def solve_equilibrium(matrix, rhs):
+    '''
+    Solves matrix @ x = rhs once.
+    '''
+    return Factorization(matrix).solve(rhs)
+
+
+def estimate_condition(factorization):
+    '''
+    Estimate of the 1-norm condition number of a square factorized matrix, from a few solves with
+    the factorization (Hager / Higham's method) instead of an inverse. inf for a singular matrix,
+    None for a non-square one.
+    '''
+    matrix = factorization.matrix
+    if matrix.shape[0] != matrix.shape[1]:
+        return None
+    if getattr(factorization, 'singular', False):
+        return float('inf')
+    inverse = spla.LinearOperator(matrix.shape, matvec=factorization.solve, rmatvec=factorization.solve_transpose, dtype=float)
+    return float(spla.onenormest(matrix) * spla.onenormest(inverse))
+
+
+def numerical_rank(factorization, tol=None):
+    '''
+    Rank of a matrix with an LU factorization, from the diagonal of U (of the augmented system, less its
+    identity block, for a non-square matrix). None without one.
+    '''
+    lu = getattr(factorization, 'lu', None)
+    offset = 0
+    if lu is None:
+        lu = getattr(factorization, 'augmented_lu', None)
+        if lu is None:
+            return None
+        offset = factorization.matrix.shape[1]
+    diagonal = np.abs(lu.U.diagonal())
+    if tol is None:
+        tol = diagonal.max(initial=0) * max(lu.shape) * np.finfo(float).eps
+    return int((diagonal > tol).sum()) - offset
+
+
+def column_entries(bridge):
+    '''
+    (columns x 4) array that decides every column of the equilibrium matrix, in the order of assemble_equilibrium:
+    (row of node A's x, row of node B's x, cos, sin) for a member and (row, -1, 1, 0) for a reaction.
+    Two columns with equal entries are equal, so comparing these finds the columns an edit changed without
+    comparing the matrices themselves.
+    '''
+    member_nodes = bridge.get_member_nodes()
+    cos, sin = bridge.get_direction_cosines()
+    reaction_rows = np.flatnonzero(bridge.get_supports().ravel())
+    members = np.column_stack([2 * member_nodes[:, 0], 2 * member_nodes[:, 1], cos, sin])
+    reactions = np.column_stack([reaction_rows, -np.ones(len(reaction_rows)), np.ones(len(reaction_rows)),
+                                 np.zeros(len(reaction_rows))])
+    return np.vstack([members, reactions])
+
+
+class UpdatedFactorization():
+    '''
+    Solves a square equilibrium matrix that differs from an already factorized one of the same size in a few
+    columns (members or supports swapped for others, members of moved nodes) without factorizing it again.
+
+    Column j of A is column positions[j] of M = A0 + W F^T, where A0 is the base matrix, F picks the k base
+    columns that changed and W holds the differences. The Woodbury identity solves M with the base LU:
+        M^-1 b = A0^-1 b - Z C^-1 F^T A0^-1 b,     Z = A0^-1 W,     C = I + F^T Z   (k x k)
+    so a solve costs one back-substitution plus a k x k system, and the transpose uses C^T the same way.
+    '''
+    def __init__(self, base, matrix, positions, changed, max_condition):
+        self.base = base
+        self.matrix = matrix
+        self.positions = positions
+        self.changed = positions[changed]  # Base columns that changed
+
+        self.W = matrix[:, changed].toarray() - base.matrix[:, self.changed].toarray()
+        self.Z = base.lu.solve(self.W)
+        self.capacitance = np.identity(len(changed)) + self.Z[self.changed]
+        self.condition = np.linalg.cond(self.capacitance) if len(changed) else 1.0
+        self.valid = self.condition < max_condition
+        self._transpose_Z = None
+
+    def solve(self, rhs):
+        rhs = np.asarray(rhs, dtype=float)
+        z = self.base.lu.solve(rhs)
+        if len(self.changed):
+            z = z - self.Z @ np.linalg.solve(self.capacitance, z[self.changed])
+        return z[self.positions]
+
+    def solve_transpose(self, rhs):
+        '''
+        Solves A^T x = rhs: M^T x = rhs put back in base column order, with A0^-T F in place of Z.
+        '''
+        rhs = np.asarray(rhs, dtype=float)
+        base_rhs = np.empty_like(rhs)
+        base_rhs[self.positions] = rhs
+        x = self.base.lu.solve(base_rhs, trans='T')
+        if len(self.changed):
+            if self._transpose_Z is None:
+                picked = np.zeros((len(self.positions), len(self.changed)))
+                picked[self.changed, np.arange(len(self.changed))] = 1
+                self._transpose_Z = self.base.lu.solve(picked, trans='T')
+            x = x - self._transpose_Z @ np.linalg.solve(self.capacitance.T, self.W.T @ x)
+        return x
+
+
+def update_factorization(base, base_columns, base_entries, matrix, columns, entries, max_rank=16, max_condition=1e8):
+    '''
+    Tries to reuse base, the Factorization of a square matrix with the column labels base_columns and
+    column_entries base_entries, for a new matrix of the same size. Columns are matched by label: a shared label
+    whose entries changed counts as one column of the update, and every new label takes the place of a gone one.
+    Returns an UpdatedFactorization, or None if the update is too big or ill-conditioned, or the matrix is so small
+    that factorizing it again is just as quick (a full solve is needed).
+    '''
+    if base.lu is None or matrix.shape != base.matrix.shape or matrix.shape[1] < MIN_UPDATE_COLUMNS:
+        return None
+
+    if columns == base_columns:
+        # Same members and supports, only the geometry may have changed
+        positions = np.arange(len(columns))
+        added = np.array([], dtype=int)
+    else:
+        base_index = {label: j for j, label in enumerate(base_columns)}
+        positions = np.array([base_index.get(label, -1) for label in columns], dtype=int)
+        added = np.flatnonzero(positions < 0)
+        # Square before and after, so there are as many gone columns as new ones: the new ones take their places
+        positions[added] = np.setdiff1d(np.arange(len(base_columns)), positions[positions >= 0])
+
+    changed = np.flatnonzero(np.any(entries != base_entries[positions], axis=1))
+    changed = np.union1d(changed, added)
+    if len(changed) > max_rank:
+        return None
+
+    update = UpdatedFactorization(base, matrix, positions, changed, max_condition)
+    if not update.valid:
+        return None
+    return update
@@ -0,0 +1,122 @@
+'''
+Direct stiffness method: the second way Bridge.solve can solve a truss (method='stiffness').
+
+The equilibrium method solves for the member forces directly, which fixes them for a statically determinate
+truss but leaves a redundant one to the minimum norm solution. Here every member is a spring of axial
+stiffness k = E A / L instead, and the forces follow from compatibility, so redundant members share the load
+in proportion to their stiffness. On top of the forces it gives the node displacements.
+
+With c = (cos, sin) from node A to node B, a member adds k [[c c^T, -c c^T], [-c c^T, c c^T]] to the rows and
+columns of its two nodes. The global stiffness matrix K (two rows per node) is built in COO form like the
+equilibrium matrix, the supported rows and columns are dropped, and the rest is factorized once with a
+sparse Cholesky factorization: CHOLMOD from scikit-sparse if it is installed, otherwise SuperLU with a
+symmetric ordering. Then
+    displacements       K_ff u_f = f_f
+    member forces       k c . (u_B - u_A), positive in tension
+    reactions           the rows of the supported directions: R = K_sf u_f - f_s
+The sign conventions match solver.py: a rhs from solver.load_vector points the load down, and the forces and
+reactions are the same numbers the equilibrium method gives for a statically determinate truss, up to rounding:
+the forces come from differences of displacements, which lose digits as K gets ill-conditioned on long slender
+spans (about 1e-11 on a 50 panel Pratt truss, 1e-7 on 500 panels). A truss so slender that K is singular to
+working precision is reported like a mechanism.
+'''
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+try:
+    from sksparse.cholmod import cholesky, CholmodError
+except ImportError:  # scikit-sparse is optional, SuperLU does the same job a little slower
+    cholesky = None
+
+
+def assemble_stiffness(bridge, axial_stiffness):
+    '''
+    Global stiffness matrix (CSC, 2*nodes x 2*nodes) of the bridge, with axial_stiffness (E A / L) for every member.
+    '''
+    member_nodes = bridge.get_member_nodes()
+    cos, sin = bridge.get_direction_cosines()
+
+    # Rows 2a, 2a+1, 2b, 2b+1 of every member, and the vector s = (c, -c) so that the member's block is k s s^T
+    dofs = np.column_stack([2 * member_nodes[:, 0], 2 * member_nodes[:, 0] + 1,
+                            2 * member_nodes[:, 1], 2 * member_nodes[:, 1] + 1])
+    s = np.column_stack([cos, sin, -cos, -sin])
+    blocks = axial_stiffness[:, None, None] * s[:, :, None] * s[:, None, :]  # (members x 4 x 4)
+
+    rows = np.broadcast_to(dofs[:, :, None], blocks.shape).ravel()
+    cols = np.broadcast_to(dofs[:, None, :], blocks.shape).ravel()
+    size = 2 * bridge.num_nodes
+    return sp.coo_matrix((blocks.ravel(), (rows, cols)), shape=(size, size)).tocsc()  # duplicate entries are summed
+
+
+class StiffnessFactorization():
+    '''
+    Factorized stiffness matrix of a bridge, reusable for any number of load vectors.
+    singular is True if the truss is a mechanism (or too close to one to trust), then nothing can be solved.
+    '''
+    def __init__(self, bridge, axial_stiffness):
+        self.member_nodes = bridge.get_member_nodes().copy()
+        self.axial_stiffness = axial_stiffness
+        cos, sin = bridge.get_direction_cosines()
+        self.directions = np.column_stack([cos, sin])
+
+        self.matrix = assemble_stiffness(bridge, axial_stiffness)
+        supported = bridge.get_supports().ravel()
+        self.free = np.flatnonzero(~supported)
+        self.supported = np.flatnonzero(supported)
+        free_matrix = self.free_matrix = self.matrix[self.free][:, self.free].tocsc()
+
+        self.factor = None
+        self.lu = None
+        self.singular = False
+        if len(self.free) == 0:
+            return
+        if cholesky is not None:
+            try:
+                self.factor = cholesky(free_matrix)
+                pivots = self.factor.D()
+            except CholmodError:  # Not positive definite
+                self.singular = True
+                return
+        else:
+            try:
+                # K is symmetric positive definite for a stable truss, so the diagonal pivots are safe
+                # and a symmetric ordering keeps the factor as sparse as a Cholesky factor
+                self.lu = spla.splu(free_matrix, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0,
+                                    options={'SymmetricMode': True})
+            except RuntimeError:  # Factor is exactly singular
+                self.singular = True
+                return
+            pivots = self.lu.U.diagonal()
+        # A mechanism leaves a pivot that is only rounding error, the same tolerance as solver.numerical_rank
+        pivots = np.abs(pivots)
+        self.singular = bool(pivots.min() <= pivots.max() * len(pivots) * np.finfo(float).eps)
+
+    def solve(self, rhs):
+        '''
+        Displacements (one vector of 2*nodes, x and y of every node) under rhs, in the convention of solver.load_vector.
+        '''
+        loads = -np.asarray(rhs, dtype=float)  # External forces on the nodes
+        displacements = np.zeros(len(loads))
+        if len(self.free):
+            if self.factor is not None:
+                displacements[self.free] = self.factor(loads[self.free])
+            else:
+                displacements[self.free] = self.lu.solve(loads[self.free])
+        return displacements
+
+    def member_forces(self, displacements):
+        '''
+        Axial force of every member (positive in tension) for the displacements of solve.
+        '''
+        u = displacements.reshape(-1, 2)
+        stretch = ((u[self.member_nodes[:, 1]] - u[self.member_nodes[:, 0]]) * self.directions).sum(axis=1)
+        return self.axial_stiffness * stretch
+
+    def reactions(self, displacements, rhs):
+        '''
+        (nodes x 2) support reactions for the displacements of solve under rhs, 0 where a node isn't supported.
+        '''
+        reactions = np.zeros(len(displacements))
+        reactions[self.supported] = (self.matrix[self.supported] @ displacements) + np.asarray(rhs)[self.supported]
+        return reactions.reshape(-1, 2)
@@ -0,0 +1,47 @@
+'''
+Regression tests for the Bridge indexes: the hash indexes by ID, position and node pair have to stay in sync with
+the node and member arrays through every edit. Also checks that importing bridge leaves the analysis modules
+to the methods that use them.
+
+    python -m pytest -q
+'''
+import subprocess
+import sys
+
+import pytest
+
+from trusses import generate
+
+
+def test_move_onto_another_node_is_rejected():
+    bridge = generate('pratt', 20)
+    nodes = bridge.get_nodes()
+    node, other = nodes[1], nodes[2]
+    version = bridge.version
+
+    with pytest.raises(ValueError, match=f"onto node {other.get_id()}"):
+        node.set_x(other.get_x())
+
+    # Nothing changed, and both nodes are still found by position
+    assert (node.get_x(), node.get_y()) == (10.0, 0.0)
+    assert bridge.version == version
+    assert bridge.get_node_at(node.get_x(), node.get_y()) is node
+    assert bridge.get_node_at(other.get_x(), other.get_y()) is other
+
+
+def test_move_keeps_the_position_index():
+    bridge = generate('pratt', 20)
+    node = bridge.get_nodes()[1]
+    node.set_y(-5)
+    assert bridge.get_node_at(10, 0) is None
+    assert bridge.get_node_at(10, -5) is node
+    node.set_y(-5)  # Onto itself is no move at all
+    assert bridge.get_node_at(10, -5) is node
+
+
+def test_import_leaves_analysis_modules_unloaded():
+    # A fresh interpreter, the test session has imported them all already
+    code = ('import sys, bridge; '
+            "print(sorted({'analysis', 'collapse', 'influence', 'stiffness', 'tolerance'} & set(sys.modules)))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
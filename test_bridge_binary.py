@@ -0,0 +1,103 @@
+'''
+Regression tests for the binary bridge format: a bridge loaded with mmap=True reads its arrays straight from
+the file, so saving it back to the same path must not pull the file out from under the maps, and a round trip
+has to keep everything the bridge holds.
+
+    python -m pytest -q
+'''
+import numpy as np
+import pytest
+
+import bridge_binary
+from bridge import Bridge
+from trusses import generate
+
+
+def assert_same_bridge(bridge, expected):
+    np.testing.assert_array_equal(bridge.get_coordinates(), expected.get_coordinates())
+    np.testing.assert_array_equal(bridge.get_supports(), expected.get_supports())
+    np.testing.assert_array_equal(bridge.get_member_nodes(), expected.get_member_nodes())
+    assert [node.get_id() for node in bridge.get_nodes()] == [node.get_id() for node in expected.get_nodes()]
+    assert [member.get_id() for member in bridge.get_members()] == [member.get_id() for member in expected.get_members()]
+
+
+@pytest.mark.parametrize('members', [17, 4000])
+def test_save_over_memory_mapped_source(tmp_path, members):
+    filename = tmp_path / 'bridge.brb'
+    original = generate('pratt', members)
+    original.output = None
+    assert original.solve() == ''
+    original.save_binary(filename)
+
+    bridge = Bridge()
+    bridge.output = None
+    assert bridge.load_binary(filename, mmap=True) == ''
+    bridge.save_binary(filename)
+
+    # The bridge still reads its old arrays, and the new file loads as the same bridge
+    assert_same_bridge(bridge, original)
+    reloaded = Bridge()
+    assert reloaded.load_binary(filename) == ''
+    assert_same_bridge(reloaded, original)
+    np.testing.assert_array_equal(reloaded.result.forces, original.result.forces)
+    assert list(tmp_path.iterdir()) == [filename]
+
+
+def test_save_edited_bridge_over_memory_mapped_source(tmp_path):
+    # An edit changes the file layout, so the old file's contents can't be reused in place
+    filename = tmp_path / 'bridge.brb'
+    generate('warren', 40).save_binary(filename)
+
+    bridge = Bridge()
+    bridge.output = None
+    assert bridge.load_binary(filename, mmap=True) == ''
+    bridge.remove_member(bridge.get_members()[-1])
+    bridge.save_binary(filename)
+
+    reloaded = Bridge()
+    assert reloaded.load_binary(filename) == ''
+    assert_same_bridge(reloaded, bridge)
+
+
+def test_member_properties_round_trip(tmp_path):
+    filename = tmp_path / 'bridge.brb'
+    bridge = generate('warren', 40)
+    bridge.elastic_modulus = 200e9
+    bridge.area = 0.01
+    bridge.get_members()[3].set_area(0.02)
+    bridge.get_members()[5].set_elastic_modulus(70e9)
+    bridge.save_binary(filename)
+
+    reloaded = Bridge()
+    assert reloaded.load_binary(filename) == ''
+    assert (reloaded.elastic_modulus, reloaded.area) == (200e9, 0.01)
+    for got, expected in zip(reloaded.get_member_properties(), bridge.get_member_properties()):
+        np.testing.assert_array_equal(got, expected)
+    assert reloaded.get_members()[3].get_area() == 0.02
+    assert reloaded.get_members()[4].get_area() is None
+
+
+def test_version_1_files_still_load(tmp_path):
+    # Header without E and A, no properties section
+    filename = tmp_path / 'bridge.brb'
+    bridge = generate('pratt', 17)
+    node_ids = '\n'.join(node.get_id() for node in bridge.get_nodes()).encode('utf-8')
+    member_ids = '\n'.join(member.get_id() for member in bridge.get_members()).encode('utf-8')
+    magic = b'BRIDGE\x00\x01'
+    header = bridge_binary.HEADERS[magic]
+    offsets, size = bridge_binary._layout(header, bridge.num_nodes, bridge.num_members, len(node_ids), len(member_ids),
+                                          False, False)
+    data = bytearray(size)
+    data[:len(magic) + header.size] = magic + header.pack(bridge.num_nodes, bridge.num_members, len(node_ids),
+                                                          len(member_ids), 0, 0.0)
+    for name, values in (('coordinates', bridge.get_coordinates().astype('<f8').tobytes()),
+                         ('supports', bridge.get_supports().tobytes()),
+                         ('member_nodes', bridge.get_member_nodes().astype('<i8').tobytes()),
+                         ('node_ids', node_ids), ('member_ids', member_ids)):
+        data[offsets[name]:offsets[name] + len(values)] = values
+    filename.write_bytes(bytes(data))
+
+    reloaded = Bridge()
+    assert reloaded.load_binary(filename) == ''
+    assert_same_bridge(reloaded, bridge)
+    assert (reloaded.elastic_modulus, reloaded.area) == (bridge.elastic_modulus, bridge.area)
@@ -0,0 +1,261 @@
+'''
+Regression tests: the sparse solver has to give the member forces the original dense solver gave, a dense
+equilibrium matrix filled member by member and solved with np.linalg.lstsq.
+
+    python -m pytest -q
+'''
+import numpy as np
+import pytest
+
+from bridge import MAX_MEMBER_FORCE, SOLVER_ERROR, Member
+from solver import Factorization, UpdatedFactorization, load_vector
+import tolerance
+from trusses import generate
+
+
+def dense_unit_forces(bridge):
+    # The original solve: dense matrix, one (cos, sin) pair per member end, one column per reaction, lstsq
+    bridge.validate()
+    coordinates = bridge.get_coordinates()
+    supports = bridge.get_supports()
+    reactions = np.argwhere(supports)
+    matrix = np.zeros((2 * bridge.num_nodes, bridge.num_members + len(reactions)))
+    for j, (a, b) in enumerate(bridge.get_member_nodes()):
+        dx, dy = coordinates[b] - coordinates[a]
+        length = np.hypot(dx, dy)
+        matrix[2 * a:2 * a + 2, j] = dx / length, dy / length
+        matrix[2 * b:2 * b + 2, j] = -dx / length, -dy / length
+    for k, (node, axis) in enumerate(reactions):
+        matrix[2 * node + axis, bridge.num_members + k] = 1
+    rhs = load_vector(bridge, bridge.load_nodes, 1)
+    return np.linalg.lstsq(matrix, rhs, rcond=None)[0][:bridge.num_members]
+
+
+def with_redundant_members(bridge, count):
+    # Extra diagonals across the first panels of a generated truss (bottom node i to top node above i + 2)
+    coordinates = bridge.get_coordinates()
+    nodes = bridge.get_nodes()
+    for i in range(1, count + 1):
+        top = bridge.get_node_at(coordinates[i + 2, 0], coordinates[:, 1].max())
+        bridge.add_member(Member(bridge.next_member_id(), nodes[i], top))
+    return bridge
+
+
+TRUSSES = {
+    'pratt': lambda: generate('pratt', 60),
+    'howe': lambda: generate('howe', 60),
+    'warren': lambda: generate('warren', 60),
+    'k': lambda: generate('k', 60),
+    'pratt, 1 redundant': lambda: with_redundant_members(generate('pratt', 60), 1),
+    'howe, 3 redundant': lambda: with_redundant_members(generate('howe', 100), 3),
+}
+
+
+@pytest.mark.parametrize('name', TRUSSES)
+def test_forces_match_dense_lstsq(name):
+    bridge = TRUSSES[name]()
+    bridge.output = None
+    assert bridge.solve() == ''
+
+    unit_forces = dense_unit_forces(bridge)
+    max_load = MAX_MEMBER_FORCE / np.abs(unit_forces).max()
+    assert bridge.load == pytest.approx(max_load, rel=1e-9)
+
+    forces = bridge.internal_forces
+    assert list(forces.index) == ['F' + member.get_id() for member in bridge.get_members()]
+    np.testing.assert_allclose(forces.to_numpy(), unit_forces * max_load, rtol=1e-9, atol=1e-6)
+
+
+def test_redundant_reactions_match_dense_lstsq():
+    # Pinned at both ends: one redundant reaction instead of a redundant member
+    bridge = generate('warren', 40)
+    bridge.output = None
+    bridge.validate()
+    bridge.right_node.set_support_x(True)
+    assert bridge.solve() == ''
+    np.testing.assert_allclose(bridge.result.unit_forces, dense_unit_forces(bridge), rtol=1e-9, atol=1e-12)
+
+
+def test_large_redundant_truss_solves():
+    # Used to run out of LSQR iterations and be reported as a mechanism
+    bridge = with_redundant_members(generate('pratt', 4000), 1)
+    bridge.output = None
+    assert bridge.solve() == ''
+    matrix = bridge.get_equilibrium()[0]
+    x = np.r_[bridge.result.unit_forces, bridge.result.unit_reactions.ravel()[bridge.get_supports().ravel()]]
+    rhs = load_vector(bridge, bridge.load_nodes, 1)
+    assert np.linalg.norm(matrix @ x - rhs) <= 1e-8 * np.linalg.norm(rhs)
+
+
+def test_mechanism_is_rejected():
+    bridge = generate('pratt', 20)
+    bridge.output = None
+    # Swap a diagonal for a member along the bottom chord: right member count, but a panel can shear
+    bridge.remove_member(bridge.get_members()[-1])
+    nodes = bridge.get_nodes()
+    bridge.add_member(Member('extra', nodes[0], nodes[2]))
+    assert 'mechanism' in bridge.solve()
+
+
+def test_unbalanced_answer_of_a_stable_truss_is_not_a_mechanism():
+    # A full-rank truss whose answer doesn't balance the load is a solver failure, not a mechanism
+    bridge = with_redundant_members(generate('pratt', 200), 1)
+    bridge.output = None
+    bridge.validate()
+    factorization, _ = bridge.get_factorization()
+    rhs = load_vector(bridge, bridge.load_nodes, 1)
+    solution = factorization.solve(rhs)
+    assert bridge._check_residual(factorization, solution, rhs) == ''
+    assert bridge._check_residual(factorization, solution * 1.01, rhs) == SOLVER_ERROR
+
+
+def test_solve_many_matches_dense_lstsq_per_case():
+    bridge = with_redundant_members(generate('pratt', 40), 2)
+    bridge.output = None
+    bridge.validate()
+    rng = np.random.default_rng(0)
+    load_cases = rng.standard_normal((5, 2 * bridge.num_nodes))
+
+    forces, critical, max_loads = bridge.solve_many(load_cases)
+
+    matrix = bridge.get_equilibrium()[0].toarray()
+    for case, rhs in enumerate(load_cases):
+        expected = np.linalg.lstsq(matrix, rhs, rcond=None)[0][:bridge.num_members]
+        np.testing.assert_allclose(forces[case], expected, rtol=1e-9, atol=1e-9)
+        assert critical[case] == np.abs(expected).argmax()
+
+
+def test_solve_many_rejects_what_solve_rejects():
+    bridge = generate('pratt', 20)
+    bridge.output = None
+    bridge.remove_member(bridge.get_members()[-1])
+    bridge.add_member(Member('extra', bridge.get_nodes()[0], bridge.get_nodes()[2]))
+    message = bridge.solve()
+    with pytest.raises(ValueError, match='mechanism') as error:
+        bridge.solve_many(np.ones((3, 2 * bridge.num_nodes)))
+    assert str(error.value) == message
+
+
+def test_influence_lines_of_redundant_truss_match_dense_lstsq():
+    bridge = with_redundant_members(generate('pratt', 40), 2)
+    bridge.output = None
+    bridge.validate()
+    lines = bridge.get_influence_lines()
+
+    matrix = bridge.get_equilibrium()[0].toarray()
+    coordinates = bridge.get_coordinates()
+    roadway = np.flatnonzero(coordinates[:, 1] == 0)
+    roadway = roadway[np.argsort(coordinates[roadway, 0])]
+    np.testing.assert_array_equal(lines.positions, coordinates[roadway, 0])
+    for position, node in enumerate(roadway):
+        rhs = np.zeros(matrix.shape[0])
+        rhs[2 * node + 1] = 1
+        expected = np.linalg.lstsq(matrix, rhs, rcond=None)[0][:bridge.num_members]
+        np.testing.assert_allclose(lines.forces[position], expected, rtol=1e-9, atol=1e-9)
+
+
+def test_influence_lines_reject_what_solve_rejects():
+    bridge = generate('pratt', 20)
+    bridge.output = None
+    bridge.remove_member(bridge.get_members()[-1])
+    bridge.add_member(Member('extra', bridge.get_nodes()[0], bridge.get_nodes()[2]))
+    message = bridge.solve()
+    with pytest.raises(ValueError, match='mechanism') as error:
+        bridge.get_influence_lines()
+    assert str(error.value) == message
+
+
+def test_influence_lines_check_every_block(monkeypatch):
+    # The influence solve goes through the same balance check as solve, so a bad answer is an error, not forces
+    bridge = with_redundant_members(generate('pratt', 200), 1)
+    bridge.output = None
+    bridge.validate()
+    factorization, _ = bridge.get_factorization()
+    solve = factorization.solve
+    monkeypatch.setattr(factorization, 'solve', lambda rhs: solve(rhs) * 1.01)
+    with pytest.raises(ValueError) as error:
+        bridge.get_influence_lines()
+    assert str(error.value) == SOLVER_ERROR
+
+
+def move_node(bridge):
+    node = bridge.get_nodes()[len(bridge.get_nodes()) // 2 + 1]
+    bridge.move_node(node, node.get_x() + 0.3, node.get_y() + 0.2)
+
+
+def replace_member(bridge):
+    # Same nodes, new ID: the column moves to another label
+    member = bridge.get_members()[0]
+    bridge.remove_member(member)
+    bridge.add_member(Member('new', member.get_nodeA(), member.get_nodeB()))
+
+
+def flip_diagonal(bridge):
+    # A diagonal of a middle panel swapped for the panel's other diagonal
+    coordinates = bridge.get_coordinates()
+    a, b = bridge.get_member_nodes().T
+    diagonals = np.flatnonzero((coordinates[a] != coordinates[b]).all(axis=1))
+    diagonal = diagonals[len(diagonals) // 2]
+    a, b = (bridge.get_nodes()[i] for i in bridge.get_member_nodes()[diagonal])
+    bridge.remove_member(bridge.get_members()[diagonal])
+    bridge.add_member(Member('flipped', bridge.get_node_at(b.get_x(), a.get_y()), bridge.get_node_at(a.get_x(), b.get_y())))
+
+
+@pytest.mark.parametrize('edit', [move_node, replace_member, flip_diagonal])
+def test_incremental_solve_matches_full_solve(edit):
+    bridge = generate('pratt', 4000)
+    bridge.output = None
+    assert bridge.solve(incremental=True) == ''
+    edit(bridge)
+    assert bridge.solve(incremental=True) == ''
+    factorization, _ = bridge.get_factorization()
+    assert isinstance(factorization, UpdatedFactorization)
+
+    full = bridge.copy()
+    full.output = None
+    assert full.solve() == ''
+    np.testing.assert_allclose(bridge.result.unit_forces, full.result.unit_forces, rtol=1e-9, atol=1e-12)
+
+    # The adjoint system too, which get_sensitivities solves
+    rhs = np.random.default_rng(0).standard_normal(factorization.matrix.shape[1])
+    expected = Factorization(factorization.matrix).solve_transpose(rhs)
+    np.testing.assert_allclose(factorization.solve_transpose(rhs), expected, rtol=1e-9, atol=1e-9)
+
+
+def test_tolerance_analysis_rejects_what_solve_rejects():
+    bridge = generate('pratt', 20)
+    bridge.output = None
+    bridge.remove_member(bridge.get_members()[-1])
+    bridge.add_member(Member('extra', bridge.get_nodes()[0], bridge.get_nodes()[2]))
+    message = bridge.solve()
+    with pytest.raises(ValueError, match='mechanism') as error:
+        bridge.get_tolerance_analysis(runs=10)
+    assert str(error.value) == message
+
+    # Perturbed mechanisms are no longer exactly singular, but their answers don't balance the load
+    coordinates = bridge.get_coordinates() + np.random.default_rng(0).normal(0, 0.1, (5, bridge.num_nodes, 2))
+    matrices, _ = tolerance.stacked_matrices(bridge, coordinates)
+    assert np.isnan(tolerance.solve_stacked(matrices, load_vector(bridge, bridge.load_nodes, 1))).all()
+
+
+def test_tolerance_analysis_of_redundant_truss_refines_like_dense(monkeypatch):
+    bridge = with_redundant_members(generate('pratt', 200), 2)
+    bridge.output = None
+    refined = bridge.get_tolerance_analysis(runs=50, seed=0)
+    monkeypatch.setattr(tolerance, 'DENSE_ROWS', 2 * bridge.num_nodes)
+    dense = bridge.get_tolerance_analysis(runs=50, seed=0)
+
+    assert refined.singular == dense.singular == 0
+    np.testing.assert_allclose(refined.max_loads, dense.max_loads, rtol=1e-9)
+    np.testing.assert_array_equal(refined.critical_members, dense.critical_members)
+
+
+@pytest.mark.parametrize('name', ['pratt, 1 redundant', 'howe, 3 redundant'])
+def test_optimizer_scores_what_solve_accepts(name):
+    from optimize import DesignSpace, evaluate_design
+
+    bridge = TRUSSES[name]()
+    bridge.output = None
+    assert bridge.solve() == ''
+    space = DesignSpace(bridge, extra_member_radius=0)
+    assert evaluate_design(space, space.coordinates, space.initial_members) == pytest.approx(bridge.efficiency, rel=1e-9)
@@ -0,0 +1,278 @@
+'''
+Monte Carlo tolerance analysis: how much the max load and efficiency of a bridge move when every node is
+off its nominal position by a random fabrication error.
+
+The runs are solved in chunks that fit in memory_budget bytes, and each run is loaded like Bridge.solve
+loads the nominal bridge (the roadway nodes of the nominal geometry carry the load). Two ways:
+    dense       the chunk is assembled as a stack of dense equilibrium matrices (runs x 2*nodes x unknowns) and
+                solved with NumPy's batched linear algebra. With redundant members or reactions the minimum norm
+                solution x = A^T (A A^T)^-1 b is used, the same solution Bridge.solve gives.
+    refined     for trusses with more than DENSE_ROWS equations, where dense solves cost (2*nodes)^3 per run.
+                Every run starts from the nominal solution and is refined with x += A0^-1 (b - A x), where A0^-1 is
+                the sparse LU of the nominal matrix applied to all the runs of the chunk in one back-substitution,
+                and A x comes from the stacked (runs x members x 2) member directions. A redundant truss is refined
+                the same way on the augmented system [I A^T; A 0] [x; y] = [0; b] that solver.Factorization
+                factorizes for it. Small errors converge in a few steps; runs that don't are solved densely.
+A run whose solution doesn't balance the load to RESIDUAL_TOLERANCE, the test Bridge.solve applies, is counted
+as a mechanism.
+'''
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from solver import RESIDUAL_TOLERANCE, Factorization
+
+
+MEMORY_BUDGET = 256 * 2**20
+DENSE_ROWS = 128  # Up to this many equations the dense stack is the faster way
+REFINE_STEPS = 30
+REFINE_TOLERANCE = 1e-12
+
+
+class MonteCarloResult():
+    '''
+    Outcome of every run, NaN (and critical member -1) where a perturbed truss was a mechanism:
+        max_loads           total load each run carries before its critical member fails
+        efficiencies        max load / total member length of each run
+        critical_members    index of the member that fails first in each run
+        failure_rates       fraction of the (solvable) runs in which each member fails first
+        nominal_load, nominal_efficiency, singular (number of runs that were mechanisms)
+    '''
+    def __init__(self, members, max_loads, efficiencies, critical_members, nominal_load, nominal_efficiency):
+        self.members = members
+        self.max_loads = max_loads
+        self.efficiencies = efficiencies
+        self.critical_members = critical_members
+        self.nominal_load = nominal_load
+        self.nominal_efficiency = nominal_efficiency
+
+        solved = critical_members >= 0
+        self.singular = int((~solved).sum())
+        counts = np.bincount(critical_members[solved], minlength=len(members))
+        self.failure_rates = counts / max(1, solved.sum())
+
+    def statistics(self):
+        '''
+        Mean, standard deviation, minimum, 5th, 50th and 95th percentile of the max load and efficiency,
+        and the members that failed first in at least 1% of the runs (ID -> fraction of the runs).
+        '''
+        stats = {'runs': len(self.max_loads), 'singular': self.singular}
+        for name, values in (('max_load', self.max_loads), ('efficiency', self.efficiencies)):
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                continue
+            p5, p50, p95 = np.percentile(values, [5, 50, 95])
+            stats[name] = {'mean': float(values.mean()), 'std': float(values.std()), 'min': float(values.min()),
+                           'p5': float(p5), 'p50': float(p50), 'p95': float(p95)}
+        order = np.argsort(-self.failure_rates)
+        stats['critical_members'] = {self.members[i].get_id(): float(self.failure_rates[i])
+                                     for i in order if self.failure_rates[i] >= 0.01}
+        return stats
+
+    def to_pandas(self):
+        '''
+        DataFrame with one row per run: max_load, efficiency and critical_member (member ID, None for a mechanism).
+        '''
+        import pandas as pd
+
+        ids = [member.get_id() for member in self.members]
+        return pd.DataFrame({
+            'max_load': self.max_loads,
+            'efficiency': self.efficiencies,
+            'critical_member': [ids[i] if i >= 0 else None for i in self.critical_members.tolist()],
+        })
+
+
+def stacked_matrices(bridge, coordinates):
+    '''
+    Dense equilibrium matrices (k x 2*nodes x unknowns) of the bridge with k sets of node coordinates (k x nodes x 2),
+    with the same rows and columns as solver.assemble_equilibrium, and the total member length of each set.
+    '''
+    member_nodes = bridge.get_member_nodes()
+    a = member_nodes[:, 0]
+    b = member_nodes[:, 1]
+    reaction_rows = np.flatnonzero(bridge.get_supports().ravel())
+    num_members = len(member_nodes)
+
+    delta = coordinates[:, b] - coordinates[:, a]
+    lengths = np.hypot(delta[..., 0], delta[..., 1])
+    cos = delta[..., 0] / lengths
+    sin = delta[..., 1] / lengths
+
+    columns = np.arange(num_members)
+    matrices = np.zeros((len(coordinates), 2 * bridge.num_nodes, num_members + len(reaction_rows)))
+    matrices[:, 2 * a, columns] = cos
+    matrices[:, 2 * a + 1, columns] = sin
+    matrices[:, 2 * b, columns] = -cos
+    matrices[:, 2 * b + 1, columns] = -sin
+    matrices[:, reaction_rows, num_members + np.arange(len(reaction_rows))] = 1
+    return matrices, lengths.sum(axis=1)
+
+
+def solve_stacked(matrices, rhs):
+    '''
+    Solves every matrix @ x = rhs of the stack, NaN where a matrix is singular or so close to it that the
+    solution doesn't balance rhs (to RESIDUAL_TOLERANCE, like Bridge.solve).
+    '''
+    square = matrices.shape[1] == matrices.shape[2]
+    system = matrices if square else matrices @ matrices.transpose(0, 2, 1)
+    b = np.broadcast_to(rhs[:, None], (len(matrices), len(rhs), 1))
+
+    try:
+        y = np.linalg.solve(system, b)
+    except np.linalg.LinAlgError:
+        # One singular matrix fails the whole batch, so solve them one by one
+        y = np.full(b.shape, np.nan)
+        for i in range(len(system)):
+            try:
+                y[i] = np.linalg.solve(system[i], b[i])
+            except np.linalg.LinAlgError:
+                pass
+
+    x = y if square else matrices.transpose(0, 2, 1) @ y
+    residual = np.linalg.norm(matrices @ x - b, axis=(1, 2))
+    x[~(residual <= RESIDUAL_TOLERANCE * np.linalg.norm(rhs))] = np.nan
+    return x[..., 0]
+
+
+class RefinedSolver():
+    '''
+    Solves perturbed versions of an equilibrium matrix by iterative refinement from the sparse LU of the nominal one,
+    factorization (a solver.Factorization). A square matrix is refined directly; otherwise the refinement runs on the
+    augmented system [I A^T; A 0] that factorization holds, whose solution is the minimum norm solution of the
+    perturbed matrix, the same one Bridge.solve gives.
+    '''
+    def __init__(self, bridge, factorization, rhs):
+        self.rhs = rhs
+        self.lu = factorization.lu
+        self.unknowns = factorization.matrix.shape[1]
+        if self.lu is None:
+            self.lu = factorization.augmented_lu
+            self.start = self.lu.solve(np.r_[np.zeros(self.unknowns), rhs])
+        else:
+            self.start = self.lu.solve(rhs)
+        member_nodes = bridge.get_member_nodes()
+        self.member_nodes = member_nodes
+        self.num_nodes = bridge.num_nodes
+        self.reaction_rows = np.flatnonzero(bridge.get_supports().ravel())
+
+        # Node-member incidence, +1 at node A and -1 at node B: A x = incidence @ (force * direction) + reactions
+        num_members = len(member_nodes)
+        columns = np.arange(num_members)
+        self.incidence = sp.csr_matrix((np.r_[np.ones(num_members), -np.ones(num_members)],
+                                        (np.r_[member_nodes[:, 0], member_nodes[:, 1]], np.r_[columns, columns])),
+                                       shape=(self.num_nodes, num_members))
+        self.incidence_transpose = self.incidence.T.tocsr()
+
+    def multiply(self, directions, x):
+        # A x of every run: directions (k x members x 2) are the unit vectors from node A to node B
+        count, num_members = directions.shape[:2]
+        member_forces = x[:, :num_members, None] * directions  # (k x members x 2)
+        node_forces = self.incidence @ member_forces.transpose(1, 0, 2).reshape(num_members, 2 * count)
+        product = node_forces.reshape(self.num_nodes, count, 2).transpose(1, 0, 2).reshape(count, 2 * self.num_nodes)
+        product[:, self.reaction_rows] += x[:, num_members:]
+        return product
+
+    def multiply_transpose(self, directions, y):
+        # A^T y of every run: a member's direction dotted with the difference of y at its two nodes, then the reactions
+        count, num_members = directions.shape[:2]
+        node_values = y.reshape(count, self.num_nodes, 2).transpose(1, 0, 2).reshape(self.num_nodes, 2 * count)
+        member_values = (self.incidence_transpose @ node_values).reshape(num_members, count, 2).transpose(1, 0, 2)
+        return np.hstack([(member_values * directions).sum(axis=2), y[:, self.reaction_rows]])
+
+    def residual(self, directions, z):
+        if len(z[0]) == self.unknowns:
+            return self.rhs - self.multiply(directions, z)
+        # [0; b] - [I A^T; A 0] [x; y]
+        x = z[:, :self.unknowns]
+        y = z[:, self.unknowns:]
+        return np.hstack([-x - self.multiply_transpose(directions, y), self.rhs - self.multiply(directions, x)])
+
+    def solve(self, directions):
+        '''
+        Solutions (k x unknowns) for the runs with member directions (k x members x 2), NaN where refinement didn't converge
+        or converged to a solution that doesn't balance the load.
+        '''
+        z = np.tile(self.start, (len(directions), 1))
+        active = np.arange(len(directions))
+        for _ in range(REFINE_STEPS):
+            residual = self.residual(directions[active], z[active])
+            step = self.lu.solve(np.ascontiguousarray(residual.T)).T
+            z[active] += step
+            done = np.abs(step).max(axis=1) <= REFINE_TOLERANCE * np.abs(z[active]).max(axis=1)
+            active = active[~done]
+            if len(active) == 0:
+                break
+        x = z[:, :self.unknowns]
+        x[active] = np.nan
+        residual = np.linalg.norm(self.rhs - self.multiply(directions, x), axis=1)
+        x[~(residual <= RESIDUAL_TOLERANCE * np.linalg.norm(self.rhs))] = np.nan
+        return x
+
+
+def monte_carlo(bridge, rhs, runs=10000, sigma=0.1, seed=None, fixed=None, memory_budget=MEMORY_BUDGET,
+                max_member_force=500000):
+    '''
+    MonteCarloResult of runs perturbed copies of the bridge's geometry, loaded by rhs (see solver.load_vector).
+    Every node coordinate gets independent normal noise with standard deviation sigma (a scalar or an
+    (nodes x 2) array), except the nodes where fixed (a boolean array over the nodes) is True.
+    '''
+    rng = np.random.default_rng(seed)
+    coordinates = bridge.get_coordinates().copy()
+    scale = np.broadcast_to(np.asarray(sigma, dtype=float), coordinates.shape).copy()
+    if fixed is not None:
+        scale[np.asarray(fixed, dtype=bool)] = 0
+
+    num_members = bridge.num_members
+    rows = 2 * bridge.num_nodes
+    unknowns = num_members + int(bridge.get_supports().sum())
+
+    refined = None
+    if rows > DENSE_ROWS:
+        factorization = bridge.get_factorization()[0]
+        if getattr(factorization, 'lu', None) is None and getattr(factorization, 'augmented_lu', None) is None:
+            factorization = Factorization(factorization.matrix)  # A low-rank update, or singular
+        if not factorization.singular:
+            refined = RefinedSolver(bridge, factorization, rhs)
+
+    if refined is not None:
+        # Directions, solutions (of the augmented system for a redundant truss), residuals and steps of one run,
+        # with room for temporaries
+        run_bytes = 4 * 8 * (2 * num_members + 3 * len(refined.start))
+    else:
+        # The stacked matrices, their factorization (or A A^T) and the solutions of one run, with room for temporaries
+        run_bytes = 2 * 8 * (rows * unknowns + rows * rows + unknowns)
+    chunk = max(1, int(memory_budget // run_bytes))
+    member_nodes = bridge.get_member_nodes()
+
+    def evaluate(points):
+        if refined is None:
+            matrices, total_lengths = stacked_matrices(bridge, points)
+            solutions = solve_stacked(matrices, rhs)
+        else:
+            delta = points[:, member_nodes[:, 1]] - points[:, member_nodes[:, 0]]
+            lengths = np.hypot(delta[..., 0], delta[..., 1])
+            total_lengths = lengths.sum(axis=1)
+            solutions = refined.solve(delta / lengths[..., None])
+            failed = np.flatnonzero(np.isnan(solutions[:, 0]))
+            if len(failed):
+                solutions[failed] = solve_stacked(stacked_matrices(bridge, points[failed])[0], rhs)
+
+        forces = np.abs(solutions[:, :num_members])
+        largest = forces.max(axis=1)
+        critical = np.where(np.isfinite(largest), np.nan_to_num(forces, nan=-1).argmax(axis=1), -1)
+        max_loads = max_member_force / largest
+        return max_loads, max_loads / total_lengths, critical
+
+    nominal_load, nominal_efficiency, _ = evaluate(coordinates[None])
+    max_loads = np.empty(runs)
+    efficiencies = np.empty(runs)
+    critical_members = np.empty(runs, dtype=np.intp)
+    for start in range(0, runs, chunk):
+        count = min(chunk, runs - start)
+        points = coordinates + rng.standard_normal((count,) + coordinates.shape) * scale
+        done = slice(start, start + count)
+        max_loads[done], efficiencies[done], critical_members[done] = evaluate(points)
+
+    return MonteCarloResult(list(bridge.members), max_loads, efficiencies, critical_members,
+                            float(nominal_load[0]), float(nominal_efficiency[0]))
@@ -0,0 +1,111 @@
+'''
+Parametric generators for classic statically determinate bridge trusses.
+
+Every generator returns a Bridge with a roadway along y = 0 from x = 0 to x = panels * panel_width,
+pinned at the left end and on a roller at the right end, so it passes Bridge.validate and
+members + reactions = 2 * nodes.
+'''
+import numpy as np
+
+from bridge import Bridge
+
+
+def _bridge(coordinates, member_nodes, right_support):
+    coordinates = np.asarray(coordinates, dtype=float)
+    supports = np.zeros(coordinates.shape, dtype=bool)
+    supports[0] = (True, True)  # Pin
+    supports[right_support, 1] = True  # Roller
+    return Bridge.from_arrays(coordinates, supports, np.asarray(member_nodes, dtype=np.intp))
+
+
+def _flat_chords(panels, panel_width, height):
+    # Bottom nodes 0..panels, top nodes above the interior bottom nodes: panels+1 .. 2*panels-1
+    bottom = [(i * panel_width, 0) for i in range(panels + 1)]
+    top = [(i * panel_width, height) for i in range(1, panels)]
+    top_index = lambda i: panels + i  # top node above bottom node i, 1 <= i <= panels-1
+
+    members = [(i, i + 1) for i in range(panels)]  # Bottom chord
+    members += [(top_index(i), top_index(i + 1)) for i in range(1, panels - 1)]  # Top chord
+    members += [(0, top_index(1)), (panels, top_index(panels - 1))]  # End posts
+    members += [(i, top_index(i)) for i in range(1, panels)]  # Verticals
+    return bottom + top, members, top_index
+
+
+def pratt(panels, panel_width=10.0, height=10.0):
+    '''
+    Pratt truss: verticals, with the diagonals sloping down towards the middle of the span.
+    '''
+    panels = max(panels, 2)
+    coordinates, members, top = _flat_chords(panels, panel_width, height)
+    for i in range(1, panels - 1):
+        if i < panels / 2:
+            members.append((top(i), i + 1))
+        else:
+            members.append((i, top(i + 1)))
+    return _bridge(coordinates, members, panels)
+
+
+def howe(panels, panel_width=10.0, height=10.0):
+    '''
+    Howe truss: verticals, with the diagonals sloping up towards the middle of the span.
+    '''
+    panels = max(panels, 2)
+    coordinates, members, top = _flat_chords(panels, panel_width, height)
+    for i in range(1, panels - 1):
+        if i < panels / 2:
+            members.append((i, top(i + 1)))
+        else:
+            members.append((top(i), i + 1))
+    return _bridge(coordinates, members, panels)
+
+
+def warren(panels, panel_width=10.0, height=10.0):
+    '''
+    Warren truss: no verticals, one top node above the middle of every panel.
+    '''
+    panels = max(panels, 1)
+    bottom = [(i * panel_width, 0) for i in range(panels + 1)]
+    top = [((i + 0.5) * panel_width, height) for i in range(panels)]
+    top_index = lambda i: panels + 1 + i
+
+    members = [(i, i + 1) for i in range(panels)]  # Bottom chord
+    members += [(top_index(i), top_index(i + 1)) for i in range(panels - 1)]  # Top chord
+    for i in range(panels):
+        members += [(i, top_index(i)), (top_index(i), i + 1)]  # Diagonals
+    return _bridge(bottom + top, members, panels)
+
+
+def k_truss(panels, panel_width=10.0, height=10.0):
+    '''
+    K truss: interior verticals split at mid-height, with a pair of diagonals from each
+    mid-height node to the panel point on its outer side, and one diagonal in the panel left over in the middle.
+    '''
+    panels = max(panels, 2)
+    bottom = [(i * panel_width, 0) for i in range(panels + 1)]
+    top = [(i * panel_width, height) for i in range(panels + 1)]
+    middle = [(i * panel_width, height / 2) for i in range(1, panels)]
+    top_index = lambda i: panels + 1 + i
+    middle_index = lambda i: 2 * (panels + 1) + i - 1  # 1 <= i <= panels-1
+
+    members = [(i, i + 1) for i in range(panels)]  # Bottom chord
+    members += [(top_index(i), top_index(i + 1)) for i in range(panels)]  # Top chord
+    members += [(0, top_index(0)), (panels, top_index(panels))]  # End verticals
+    for i in range(1, panels):
+        members += [(i, middle_index(i)), (middle_index(i), top_index(i))]  # Split verticals
+        outer = i - 1 if i <= panels // 2 else i + 1
+        members += [(middle_index(i), outer), (middle_index(i), top_index(outer))]  # The K
+    centre = panels // 2
+    members.append((centre, top_index(centre + 1)))
+    return _bridge(bottom + top + middle, members, panels)
+
+
+GENERATORS = {'pratt': pratt, 'howe': howe, 'warren': warren, 'k': k_truss}
+MEMBERS_PER_PANEL = {'pratt': 4, 'howe': 4, 'warren': 4, 'k': 6}
+
+
+def generate(kind, members, panel_width=10.0, height=10.0):
+    '''
+    Truss of the given kind ('pratt', 'howe', 'warren' or 'k') with about the given number of members.
+    '''
+    panels = max(1, round(members / MEMBERS_PER_PANEL[kind]))
+    return GENERATORS[kind](panels, panel_width, height)